@@ -0,0 +1,70 @@
+import asyncio
+import hmac
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import FileResponse, PlainTextResponse
+
+from core.configuration import settings
+from core.profiling import list_profiles, get_profile_path, profile_summary
+from services.embedding_pool import get_embedding_pool
+from services.retention import compact_storage, sweep_expired_documents
+
+
+def require_admin(x_admin_token: str = Header(default=None)):
+    """Admin endpoints are disabled unless ADMIN_TOKEN is configured"""
+    if not settings.ADMIN_TOKEN or not x_admin_token or not hmac.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="admin token required")
+
+
+router = APIRouter(
+    prefix="/api/v1/admin",
+    tags=["Admin"],
+    dependencies=[Depends(require_admin)]
+)
+
+
+@router.get("/profiles")
+async def get_profiles():
+    """List captured request profiles, newest first"""
+    profiles = list_profiles()
+    return {"total": len(profiles), "profiles": profiles}
+
+
+@router.get("/profiles/{name}")
+async def download_profile(
+        name: str,
+        format: str = Query(default="prof", description="'prof' for the raw cProfile file, 'text' for a summary"),
+        limit: int = Query(default=40, ge=1, le=500)
+):
+    """
+    Fetch a stored profile.
+    The raw file loads in snakeviz, flameprof or pstats; the text format prints the top functions.
+    """
+    path = get_profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="profile not found")
+
+    if format == "text":
+        return PlainTextResponse(profile_summary(path, limit=limit))
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
+
+
+@router.get("/embedding-pool")
+async def embedding_pool_stats():
+    """Per-worker utilization of the ingestion embedding pool"""
+    pool = get_embedding_pool()
+    if pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **pool.stats()}
+
+
+@router.post("/retention/sweep")
+async def run_retention_sweep():
+    """Delete expired documents now instead of waiting for the background sweeper"""
+    return await asyncio.to_thread(sweep_expired_documents)
+
+
+@router.post("/compact")
+async def compact(wait_seconds: float = Query(default=60, ge=0, le=600)):
+    """VACUUM sqlite and trigger qdrant optimization, reporting the bytes reclaimed"""
+    return await asyncio.to_thread(compact_storage, wait_seconds)
@@ -1,9 +1,17 @@
-from fastapi import APIRouter, HTTPException, Depends
+from datetime import date, time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
-from core.database import get_db
-from schemas.booking_schema import BookingRequest, BookingResponse, BookingListResponse
+from core.configuration import settings
+from core.database import get_db, own_session
+from schemas.booking_schema import (
+    BookingRequest, BookingResponse, BookingListResponse, BookingListItem, AvailabilityResponse, SlotItem
+)
 from models.booking import Booking
+from services.booking import BookingService, SlotUnavailableError
 
 router = APIRouter(
     prefix="/api/v1/bookings",
@@ -24,42 +32,31 @@ async def create_booking(
     Parameters:
     - name: Full name of the candidate
     - email: Email address
-    - date: Preferred interview date (YYYY-MM-DD)
-    - time: Preferred interview time (HH:MM)
+    - booking_date: Preferred interview date (YYYY-MM-DD)
+    - booking_time: Preferred interview time (HH:MM), on the slot grid
+    - interviewer_id: Interviewer to book (optional, any free interviewer otherwise)
 
     Returns:
-    - Booking confirmation with booking ID
+    - Booking confirmation with booking ID, 409 if the slot is taken
     """
-    try:
-        print(f"  New booking request:")
-        print(f"   Name: {request.name}")
-        print(f"   Email: {request.email}")
-        print(f"   Date: {request.date}, Time: {request.time}")
+    print(f"  New booking request:")
+    print(f"   Name: {request.name}")
+    print(f"   Email: {request.email}")
+    print(f"   Date: {request.booking_date}, Time: {request.booking_time}")
 
-        # Create booking record in database
-        booking = Booking(
+    try:
+        booking = BookingService.create_booking(
+            db,
             name=request.name,
             email=request.email,
-            date=str(request.date),
-            time=str(request.time)
-        )
-
-        db.add(booking)
-        db.commit()
-        db.refresh(booking)
-
-        print(f"Booking created with ID: {booking.id}")
-
-        return BookingResponse(
-            success=True,
-            booking_id=booking.id,
-            name=booking.name,
-            email=booking.email,
-            booking_date=request.date,
-            booking_time=request.time,
-            message="Interview booking confirmed successfully!"
+            slot_date=request.booking_date,
+            slot_time=request.booking_time,
+            interviewer_id=request.interviewer_id
         )
-
+    except SlotUnavailableError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         db.rollback()
         print(f"   Booking failed: {str(e)}")
@@ -68,36 +65,119 @@ async def create_booking(
             detail=f"Failed to create booking: {str(e)}"
         )
 
+    print(f"Booking created with ID: {booking.id}")
+
+    return BookingResponse(
+        success=True,
+        booking_id=booking.id,
+        name=booking.name,
+        email=booking.email,
+        booking_date=booking.slot_date,
+        booking_time=booking.slot_time,
+        interviewer_id=booking.interviewer_id,
+        message="Interview booking confirmed successfully!"
+    )
+
+
+@router.get("/availability", response_model=AvailabilityResponse)
+async def get_availability(
+        date_from: date = Query(..., description="first day to search"),
+        date_to: Optional[date] = Query(default=None, description="last day to search, defaults to date_from"),
+        interviewer_id: Optional[str] = Query(default=None, description="only this interviewer's slots"),
+        limit: int = Query(default=200, ge=1, le=5000, description="maximum number of slots returned"),
+        db: Session = Depends(get_db)
+):
+    """Free interview slots between two dates (inclusive), earliest first"""
+    date_to = date_to or date_from
+    if date_to < date_from:
+        raise HTTPException(status_code=400, detail="date_to is before date_from")
+    if (date_to - date_from).days >= settings.BOOKING_MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"date range is limited to {settings.BOOKING_MAX_RANGE_DAYS} days")
+
+    try:
+        slots = BookingService.free_slots(db, date_from, date_to, interviewer_id, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return AvailabilityResponse(
+        date_from=date_from,
+        date_to=date_to,
+        total=len(slots),
+        slots=[SlotItem(**slot) for slot in slots]
+    )
+
+
+def _legacy_value(parse, value: str):
+    # bookings made before the typed slot columns may hold text that is not a date / time
+    try:
+        return parse(value.strip())
+    except ValueError:
+        return None
+
+
+def _booking_item(b: Booking) -> BookingListItem:
+    return BookingListItem(
+        id=b.id,
+        name=b.name,
+        email=b.email,
+        booking_date=b.slot_date or _legacy_value(date.fromisoformat, b.booking_date),
+        booking_time=b.slot_time or _legacy_value(time.fromisoformat, b.booking_time),
+        interviewer_id=b.interviewer_id,
+        created_at=b.created_at.isoformat() if b.created_at else None
+    )
+
+
+def _ndjson_export(date_from: Optional[date] = None, date_to: Optional[date] = None, email: Optional[str] = None):
+    with own_session() as db:
+        for b in BookingService.iter_bookings(db, date_from, date_to, email):
+            yield _booking_item(b).model_dump_json() + "\n"
+
 
 @router.get("/", response_model=BookingListResponse)
-async def list_all_bookings(db: Session = Depends(get_db)):
+async def list_all_bookings(
+        limit: int = Query(default=50, ge=1, le=500, description="page size"),
+        cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+        date_from: Optional[date] = Query(default=None, description="only bookings created on or after this date"),
+        date_to: Optional[date] = Query(default=None, description="only bookings created on or before this date"),
+        format: str = Query(default="json", description="'json' for one page, 'ndjson' to stream every match"),
+        db: Session = Depends(get_db)
+):
+    """
+    List bookings newest first with keyset pagination.
+    Follow next_cursor until it is null; format=ndjson streams all matching bookings instead.
+    """
+    if format == "ndjson":
+        return StreamingResponse(_ndjson_export(date_from, date_to), media_type="application/x-ndjson")
+
     try:
-        bookings = db.query(Booking).order_by(
-            Booking.created_at.desc()
-        ).all()
-
-        from schemas.booking_schema import BookingListItem
-
-        booking_items = [
-            BookingListItem(
-                id=b.id,
-                name=b.name,
-                email=b.email,
-                booking_date=b.booking_date,
-                booking_time=b.booking_time,
-                created_at=b.created_at.isoformat() if b.created_at else None
-            )
-            for b in bookings
-        ]
+        bookings, next_cursor = BookingService.get_all_bookings(db, limit, cursor, date_from, date_to)
+        booking_items = [_booking_item(b) for b in bookings]
 
         return BookingListResponse(
             total=len(booking_items),
-            bookings=booking_items
+            bookings=booking_items,
+            next_cursor=next_cursor
         )
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=f"Failed to retrieve bookings: {str(e)}"
         )
 
+
+@router.get("/email/{email}", response_model=BookingListResponse)
+async def get_bookings_by_email(
+        email: str,
+        limit: int = Query(default=50, ge=1, le=500),
+        cursor: Optional[str] = Query(default=None),
+        db: Session = Depends(get_db)
+):
+    """Bookings of one candidate, newest first, served from the (email, created_at, id) index"""
+    try:
+        bookings, next_cursor = BookingService.get_booking_by_email(db, email, limit, cursor)
+        booking_items = [_booking_item(b) for b in bookings]
+        return BookingListResponse(total=len(booking_items), bookings=booking_items, next_cursor=next_cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
@@ -1,10 +1,16 @@
-from fastapi import APIRouter, HTTPException, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import contextvars
 import uuid
 
-from core.database import get_db
+from core.admission import llm_admission, llm_deadline, LLMOverloadedError
+from core.configuration import settings
+from core.metrics import track_stage
 from core.redis_manager import redis_manager
-from schemas.chat_schema import ChatRequest, ChatResponse
+from schemas.chat_schema import ChatRequest, ChatResponse, BatchChatRequest, BatchChatResult
+from services.rag_service import CustomRAG
 from services.tool_service import ToolService
 
 router = APIRouter(
@@ -14,28 +20,34 @@ router = APIRouter(
 
 
 @router.post("/", response_model=ChatResponse)
-async def chat(request: ChatRequest, db: Session = Depends(get_db)):
+async def chat(request: ChatRequest):
     """
-    Chat endpoint that automatically decides whether to:
-    1. Book an interview → Calls booking tool
-    2. Answer a question → Uses RAG
+    Chat endpoint: one planning LLM call picks the registered tools for the message
+    (booking an interview, answering from the documents, ...) and independent tool calls run concurrently.
 
     Multi-turn conversation is supported via Redis memory.
     """
     session_id = request.session_id or str(uuid.uuid4())
+    # shed before doing any work when the LLM queue is already full
+    llm_admission.check()
 
     try:
-        chat_history = redis_manager.get_context(session_id, last_n=5)
+        with track_stage("chat", "history_load"):
+            chat_history = redis_manager.get_context(session_id, last_n=5)
 
-        answer, is_booking = ToolService.process_query(
-            query=request.query,
-            chat_history=chat_history,
-            db=db
-        )
+        # all LLM calls of the turn share one deadline
+        with llm_deadline():
+            answer, is_booking = await ToolService.process_query(
+                query=request.query,
+                chat_history=chat_history,
+                filters=request.filters.model_dump(exclude_none=True) if request.filters else None,
+                tenant_id=request.tenant_id
+            )
 
 
-        redis_manager.save_message(session_id, "user", request.query)
-        redis_manager.save_message(session_id, "assistant", answer)
+        with track_stage("chat", "memory_save"):
+            redis_manager.save_message(session_id, "user", request.query)
+            redis_manager.save_message(session_id, "assistant", answer)
 
         return ChatResponse(
             session_id=session_id,
@@ -44,11 +56,71 @@ async def chat(request: ChatRequest, db: Session = Depends(get_db)):
             sources=[] if not is_booking else [] # No sources for booking
         )
 
+    except LLMOverloadedError:
+        raise
     except Exception as e:
         print(f"Chat error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# LLM calls of batch requests run here rather than in the default executor, whose size follows the CPU count
+_generation_executor = ThreadPoolExecutor(max_workers=settings.CHAT_BATCH_CONCURRENCY, thread_name_prefix="chat-batch")
+
+
+async def _batch_results(request: BatchChatRequest):
+    """Retrieve for every query at once, then generate with bounded concurrency, yielding results as they finish"""
+    queries = request.queries
+    default_filters = request.filters.model_dump(exclude_none=True) if request.filters else None
+    filters = [q.filters.model_dump(exclude_none=True) if q.filters else default_filters for q in queries]
+
+    try:
+        contexts = await asyncio.to_thread(
+            CustomRAG.retrieve_contexts, [q.query for q in queries], request.top_k, filters, request.tenant_id
+        )
+    except Exception as e:
+        print(f"Batch retrieval error: {e}")
+        for index, q in enumerate(queries):
+            yield BatchChatResult(index=index, id=q.id, query=q.query, error=f"retrieval failed: {e}").model_dump_json() + "\n"
+        return
+
+    semaphore = asyncio.Semaphore(settings.CHAT_BATCH_CONCURRENCY)
+
+    async def answer(index: int) -> BatchChatResult:
+        q = queries[index]
+        context, results = contexts[index]
+        result = BatchChatResult(index=index, id=q.id, query=q.query, sources=CustomRAG.sources(results))
+        async with semaphore:
+            try:
+                result.answer = await asyncio.get_running_loop().run_in_executor(
+                    _generation_executor, contextvars.copy_context().run, CustomRAG.generate_answer, q.query, context
+                )
+            except Exception as e:
+                result.error = str(e)
+        return result
+
+    tasks = [asyncio.create_task(answer(index)) for index in range(len(queries))]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield (await finished).model_dump_json() + "\n"
+    finally:
+        # client went away: don't keep calling the LLM for nobody
+        for task in tasks:
+            task.cancel()
+
+
+@router.post("/batch")
+async def chat_batch(request: BatchChatRequest):
+    """
+    Answer many independent questions from the documents in one call (evaluation and analytics jobs).
+    Queries are embedded in one call and searched in one qdrant round trip; answers are generated with at most
+    CHAT_BATCH_CONCURRENCY LLM calls in flight and streamed back as NDJSON in completion order
+    (each line carries the query's index and id). No planning call, booking or chat memory.
+    """
+    if len(request.queries) > settings.CHAT_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"at most {settings.CHAT_BATCH_MAX_QUERIES} queries per batch")
+    return StreamingResponse(_batch_results(request), media_type="application/x-ndjson")
+
+
 @router.get("/history/{session_id}")
 async def get_chat_history(session_id: str):
     try:
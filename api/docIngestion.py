@@ -1,126 +1,450 @@
-from fastapi import APIRouter, HTTPException, UploadFile, Form, Depends, File
+import asyncio
+import json
+import time
+
+from fastapi import APIRouter, HTTPException, UploadFile, Form, Depends, File, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
+from typing import Callable, Dict, Optional
+from datetime import datetime
 
 import numpy as np
 
-from core.database import get_db
+from core.database import get_db, own_session
 from core.configuration import settings
+from core.metrics import track_stage, current_request_timings
+from core.profiling import profile_scope
 
-from schemas.ingestion_schema import IngestResponse, ChunkMetaData
+from schemas.ingestion_schema import (
+    IngestResponse, ChunkMetaData, ChunkListResponse, DocumentListItem, DocumentListResponse
+)
 
 from services.documentService import DocumentService
 from services.chunking import chunk_text
 from services.embeddings import generate_embeddings
-from services.vectorsStore import store_embeddings,init_qdrant_collection
+from services.embedding_store import save_document_embeddings
+from services.document_index import index_document
+from services.retention import delete_document, expiry_for
+from services.vectorsStore import (
+    store_embeddings, init_qdrant_collection,
+    update_chunk_positions, update_document_payload, delete_chunk_points, delete_document_points
+)
 
 router = APIRouter(prefix="/api/docIngestion", tags=['document ingestion'])
 
+CHUNK_OVERLAP = {'sentence': 100, 'fixed': 128, 'token': 32}
+
+
+def _validate_upload(file_name: str, strategy: str):
+    if not (file_name.endswith('.pdf') or file_name.endswith('.txt')):
+        raise HTTPException(status_code=400, detail="invalid file type")
+
+    if strategy not in CHUNK_OVERLAP:
+        raise HTTPException(status_code=400, detail="invalid chunking strategy")
+
+
+def _no_progress(event: Dict):
+    pass
+
+
+def _extract_and_chunk(file_name: str, file_bytes: bytes, strategy: str, chunk_size: int, progress: Callable = _no_progress):
+    progress({"event": "stage", "stage": "extract"})
+    try:
+        with track_stage("ingest", "extract"):
+            text = DocumentService.extract_text(file_name, file_bytes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    if not text or not text.strip():
+        raise HTTPException(status_code=400, detail="no text found in file, check file")
+
+    print(f"extracted {len(text)} characters")
+    progress({"event": "stage", "stage": "chunk", "characters": len(text)})
+
+    with track_stage("ingest", "chunk"):
+        chunks = chunk_text(
+            text=text,
+            strategy=strategy,
+            chunk_size=chunk_size,
+            overlap=CHUNK_OVERLAP[strategy]
+        )
+
+    if not chunks:
+        raise HTTPException(status_code=400, detail="fail to generate chunk")
+    return chunks
+
+
+def _slices(total: int, streaming: bool):
+    # progress is reported per slice; slices are big enough to still be sharded across the embedding pool
+    step = settings.EMBEDDING_POOL_MIN_TEXTS if streaming else max(total, 1)
+    return [(start, min(start + step, total)) for start in range(0, total, step)]
+
+
+def _ingest_upload(
+    db: Session, file_name: str, file_bytes: bytes, strategy: str, chunk_size: int,
+    tenant_id: Optional[str], ttl_days: Optional[int], progress: Optional[Callable] = None
+) -> IngestResponse:
+    """
+    Extract, chunk, embed and store one uploaded file.
+    :param progress: called with a progress event (dict) as each stage starts and as embedding / upsert advance
+    """
+    started = time.perf_counter()
+    streaming = progress is not None
+    progress = progress or _no_progress
+
+    with profile_scope("upload_documents"):
+        chunks = _extract_and_chunk(file_name, file_bytes, strategy, chunk_size, progress)
+        print(f"created {len(chunks)} chunks")
+
+        # generate embeddings - returns numpy array
+        slices = _slices(len(chunks), streaming)
+        progress({"event": "stage", "stage": "embed", "total": len(chunks)})
+        parts = []
+        with track_stage("ingest", "embed"):
+            for start, end in slices:
+                parts.append(generate_embeddings(chunks[start:end], bulk=True))
+                progress({"event": "progress", "stage": "embed", "done": end, "total": len(chunks)})
+        embeddings: np.ndarray = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        print(f"generated embeddings of shape {embeddings.shape}")
+
+        file_type = file_name.split('.')[-1]
+        progress({"event": "stage", "stage": "db_write"})
+        with track_stage("ingest", "db_write"):
+            try:
+                doc_id = DocumentService.save_document_metadata(
+                    db=db,
+                    file_name=file_name,
+                    file_type=file_type,
+                    chunk_count=len(chunks),
+                    strategy=strategy,
+                    chunk_size=chunk_size,
+                    tenant_id=tenant_id or settings.DEFAULT_TENANT,
+                    expires_at=expiry_for(tenant_id, ttl_days)
+                )
+            except TypeError as e:
+                raise HTTPException(status_code=500, detail=f"internal error: invalid metadata argument {str(e)}")
+
+            # ids (and so qdrant point ids) are fixed here, before either store is written
+            DocumentService.assign_chunk_ids(doc_id, chunks)
+            DocumentService.save_chunk_metadata(
+                db=db,
+                document_id=doc_id,
+                chunks=chunks
+            )
+        print(f"saved metadata for document {doc_id}")
+        doc = DocumentService.get_document_by_id(db, doc_id)
+
+        with track_stage("ingest", "persist_vectors"):
+            save_document_embeddings(doc_id, chunks, embeddings)
+
+        progress({"event": "stage", "stage": "upsert", "document_id": doc_id, "total": len(chunks)})
+        with track_stage("ingest", "upsert"):
+            for start, end in slices:
+                store_embeddings(
+                    chunks=chunks[start:end],
+                    embeddings=embeddings[start:end].tolist(),
+                    doc_id=doc_id,
+                    collection_name=settings.QDRANT_COLLECTION,
+                    file_type=file_type,
+                    # the stored upload time, so upload-time filters agree with sqlite and the document index
+                    upload_time=doc.upload_time,
+                    tenant_id=tenant_id
+                )
+                progress({"event": "progress", "stage": "upsert", "done": end, "total": len(chunks)})
+
+        with track_stage("ingest", "document_index"):
+            # the centroid comes from the embeddings already in memory, no second pass over the chunks
+            index_document(doc, embeddings)
+
+    print(f"document {doc_id} ingested successfully")
+    return IngestResponse(
+        file_name=file_name,
+        file_type=file_type,
+        document_id=doc_id,
+        message=f"Document {doc_id} ingested successfully",
+        version=1,
+        chunk_count=len(chunks),
+        embedded_chunks=len(chunks),
+        timings_ms={**current_request_timings(), "total": round((time.perf_counter() - started) * 1000, 2)}
+    )
+
+
+async def _ndjson_ingest(
+    file_name: str, file_bytes: bytes, strategy: str, chunk_size: int, tenant_id: Optional[str], ttl_days: Optional[int]
+):
+    """
+    Run the ingestion in a worker thread and stream its progress events as NDJSON lines,
+    ending with a "done" event carrying the summary or an "error" event.
+    """
+    loop = asyncio.get_running_loop()
+    events: asyncio.Queue = asyncio.Queue()
+
+    def emit(event: Optional[Dict]):
+        loop.call_soon_threadsafe(events.put_nowait, event)
+
+    def run():
+        try:
+            with own_session() as db:
+                result = _ingest_upload(db, file_name, file_bytes, strategy, chunk_size, tenant_id, ttl_days, progress=emit)
+            emit({"event": "done", "result": result.model_dump()})
+        except HTTPException as e:
+            emit({"event": "error", "status_code": e.status_code, "detail": e.detail})
+        except Exception as e:
+            print(f"error: {str(e)}")
+            import traceback
+            traceback.print_exc()
+            emit({"event": "error", "status_code": 500, "detail": f"internal server error: {str(e)}"})
+        finally:
+            emit(None)
+
+    # a client that disconnects stops receiving events; the ingestion itself still completes
+    worker = asyncio.ensure_future(asyncio.to_thread(run))
+    while True:
+        event = await events.get()
+        if event is None:
+            break
+        yield json.dumps(event) + "\n"
+    await worker
+
 
 @router.post("/upload", response_model=IngestResponse)
 async def upload_documents(
         file: UploadFile = File(..., description="pdf or txt file to upload"),
-        strategy: str = Form(default="sentence", description="chunking strategy: 'sentence' or 'fixed'"),
-        chunk_size: int = Form(default=500, ge=100, le=2000, description="size of chunks in character"),
+        strategy: str = Form(default="sentence", description="chunking strategy: 'sentence', 'fixed' or 'token'"),
+        chunk_size: int = Form(default=500, ge=100, le=2000, description="size of chunks in character (in model tokens for 'token', capped at the model max length)"),
+        tenant_id: Optional[str] = Form(default=None, description="owner of the document, selects the tenant's retention policy"),
+        ttl_days: Optional[int] = Form(default=None, ge=1, description="delete the document after this many days, overrides the tenant policy"),
+        stream: bool = Form(default=False, description="stream progress events as NDJSON instead of returning only the summary"),
         db: Session = Depends(get_db)
 ):
     """
-    Upload and ingest a document: validate type, extract text, chunking, embedding and storing in qdrant and sqlite
+    Upload and ingest a document: validate type, extract text, chunking, embedding and storing in qdrant and sqlite.
+    Chunks are not echoed back; page through them with GET /{document_id}/chunks.
     :param file: file to be uploaded
     :param strategy: chunking strategy
     :param chunk_size: target size of chunks
+    :param tenant_id: owner of the document
+    :param ttl_days: retention of this document in days
+    :param stream: report extract/chunk/embed/upsert progress as NDJSON events, ending with the summary
     :param db: database session
-    :return: document id and ingestion details
+    :return: document id, chunk counts and stage timings
     """
+    _validate_upload(file.filename, strategy)
+
+    print(f"processing file: {file.filename}")
+    file_bytes = await file.read()
+    if stream:
+        return StreamingResponse(
+            _ndjson_ingest(file.filename, file_bytes, strategy, chunk_size, tenant_id, ttl_days),
+            media_type="application/x-ndjson"
+        )
+
     try:
-        # validate file type
-        if not (file.filename.endswith('.pdf') or file.filename.endswith('.txt')):
-            raise HTTPException(status_code=400, detail="invalid file type")
+        return _ingest_upload(db, file.filename, file_bytes, strategy, chunk_size, tenant_id, ttl_days)
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"error: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=f"internal server error: {str(e)}")
 
-        if strategy not in ['sentence', 'fixed']:
-            raise HTTPException(status_code=400, detail="invalid chunking strategy")
 
-        print(f"processing file: {file.filename}")
+def _document_item(doc) -> DocumentListItem:
+    return DocumentListItem(
+        document_id=doc.document_id,
+        file_name=doc.file_name,
+        file_type=doc.file_type,
+        chunk_count=doc.chunk_count,
+        chunking_strategy=doc.chunking_strategy,
+        chunk_size=doc.chunk_size,
+        version=doc.version,
+        upload_time=doc.upload_time.isoformat() if doc.upload_time else None
+    )
 
-        file_bytes = await file.read()
-        try:
-            text = DocumentService.extract_text(file.filename, file_bytes)
-        except ValueError as e:
-            raise HTTPException(status_code=400, detail=str(e))
 
-        if not text or not text.strip():
-            raise HTTPException(status_code=400, detail="no text found in file, check file")
+def _ndjson_documents(uploaded_after: Optional[datetime], uploaded_before: Optional[datetime]):
+    with own_session() as db:
+        for doc in DocumentService.iter_documents(db, uploaded_after, uploaded_before):
+            yield _document_item(doc).model_dump_json() + "\n"
 
-        print(f"extracted {len(text)} characters")
 
-        overlap = 100 if strategy == 'sentence' else 128
-        chunks = chunk_text(
-            text=text,
-            strategy=strategy,
-            chunk_size=chunk_size,
-            overlap=overlap
+@router.get("/documents", response_model=DocumentListResponse)
+async def list_documents(
+        limit: int = Query(default=50, ge=1, le=500, description="page size"),
+        cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+        uploaded_after: Optional[datetime] = Query(default=None),
+        uploaded_before: Optional[datetime] = Query(default=None),
+        format: str = Query(default="json", description="'json' for one page, 'ndjson' to stream every match"),
+        db: Session = Depends(get_db)
+):
+    """List ingested documents, newest upload first, with keyset pagination"""
+    if format == "ndjson":
+        return StreamingResponse(_ndjson_documents(uploaded_after, uploaded_before), media_type="application/x-ndjson")
+
+    try:
+        docs, next_cursor = DocumentService.get_all_documents(db, limit, cursor, uploaded_after, uploaded_before)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    items = [_document_item(doc) for doc in docs]
+    return DocumentListResponse(total=len(items), documents=items, next_cursor=next_cursor)
+
+
+@router.get("/{document_id}/chunks", response_model=ChunkListResponse)
+async def list_chunks(
+        document_id: str,
+        limit: int = Query(default=100, ge=1, le=1000, description="page size"),
+        cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+        db: Session = Depends(get_db)
+):
+    """List a document's chunks in document order, with keyset pagination on the chunk index"""
+    doc = DocumentService.get_document_by_id(db, document_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="document not found")
+
+    try:
+        rows, next_cursor = DocumentService.get_chunks(db, document_id, limit, cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    chunks = [
+        ChunkMetaData(
+            chunk_text=row.text,
+            chunk_index=row.chunk_index,
+            chunk_strategy=doc.chunking_strategy,
+            chunk_id=row.chunk_id,
+            char_count=row.char_count
         )
+        for row in rows
+    ]
+    return ChunkListResponse(document_id=document_id, total=doc.chunk_count, chunks=chunks, next_cursor=next_cursor)
 
-        if not chunks:
-            raise HTTPException(status_code=400, detail="fail to generate chunk")
 
-        print(f"created {len(chunks)} chunks")
+@router.put("/{document_id}", response_model=IngestResponse)
+async def reingest_document(
+        document_id: str,
+        file: UploadFile = File(..., description="new version of the pdf or txt file"),
+        strategy: Optional[str] = Form(default=None, description="chunking strategy, defaults to the one stored for the document"),
+        chunk_size: Optional[int] = Form(default=None, ge=100, le=2000, description="chunk size, defaults to the one stored for the document"),
+        db: Session = Depends(get_db)
+):
+    """
+    Re-ingest a new version of an existing document.
+    Only chunks whose text changed are embedded and upserted; kept chunks keep their points
+    (their position is updated in place) and points of removed chunks are deleted in bulk.
+    """
+    try:
+        doc = DocumentService.get_document_by_id(db, document_id)
+        if doc is None:
+            raise HTTPException(status_code=404, detail="document not found")
 
-        # generate embeddings - returns numpy array
-        embeddings: np.ndarray = generate_embeddings(chunks)
-        print(f"generated embeddings of shape {embeddings.shape}")
+        strategy = strategy or doc.chunking_strategy
+        chunk_size = chunk_size or doc.chunk_size
+        _validate_upload(file.filename, strategy)
 
+        print(f"re-ingesting document {document_id} from {file.filename}")
+        started = time.perf_counter()
         file_type = file.filename.split('.')[-1]
-        try:
-            doc_id = DocumentService.save_document_metadata(
-                db=db,
-                file_name=file.filename,
-                file_type=file_type,
-                chunk_count=len(chunks),
-                strategy=strategy,
-                chunk_size=chunk_size
-            )
-        except TypeError as e:
-            raise HTTPException(status_code=500, detail=f"internal error: invalid metadata argument {str(e)}")
+        file_type_changed = file_type.lower() != (doc.file_type or "").lower()
+        file_bytes = await file.read()
+        with profile_scope("reingest_document"):
+            chunks = _extract_and_chunk(file.filename, file_bytes, strategy, chunk_size)
+            DocumentService.assign_chunk_ids(document_id, chunks)
 
-        DocumentService.save_chunk_metadata(
-            db=db,
-            document_id=doc_id,
-            chunks=chunks
-        )
+            with track_stage("ingest", "diff"):
+                added, moved, removed, legacy = DocumentService.diff_chunks(db, document_id, chunks)
+            print(f"{len(added)} new, {len(moved)} moved, {len(removed)} removed, "
+                  f"{len(chunks) - len(added)} reused chunks")
 
-        print(f"saved metadata for document {doc_id}")
-        print(f"Type of embeddings: {type(embeddings)}, Type of one embedding: {type(embeddings[0])}")
+            if added:
+                with track_stage("ingest", "embed"):
+                    embeddings: np.ndarray = generate_embeddings(added, bulk=True)
 
-        store_embeddings(
-            chunks=chunks,
-            embeddings=embeddings.tolist(),
-            doc_id=doc_id,
-            collection_name=settings.QDRANT_COLLECTION
-        )
+            # sqlite is committed first: if that fails qdrant is untouched, no orphaned points
+            with track_stage("ingest", "db_write"):
+                DocumentService.apply_chunk_diff(
+                    db, doc, added, moved, removed,
+                    chunk_count=len(chunks),
+                    file_name=file.filename,
+                    file_type=file_type,
+                    strategy=strategy,
+                    chunk_size=chunk_size
+                )
+
+            if added:
+                with track_stage("ingest", "upsert"):
+                    if legacy:
+                        # chunks stored before content hashes have random point ids, replace them all
+                        delete_document_points(document_id, collection_name=settings.QDRANT_COLLECTION, tenant_id=doc.tenant_id)
+                    store_embeddings(
+                        chunks=added,
+                        embeddings=embeddings.tolist(),
+                        doc_id=document_id,
+                        collection_name=settings.QDRANT_COLLECTION,
+                        file_type=file_type,
+                        upload_time=doc.upload_time,
+                        tenant_id=doc.tenant_id
+                    )
+            with track_stage("ingest", "upsert"):
+                update_chunk_positions(moved, collection_name=settings.QDRANT_COLLECTION, tenant_id=doc.tenant_id)
+                if file_type_changed:
+                    update_document_payload(
+                        document_id, {"file_type": file_type.lower()},
+                        collection_name=settings.QDRANT_COLLECTION, tenant_id=doc.tenant_id
+                    )
+                if not legacy:
+                    delete_chunk_points(document_id, removed, collection_name=settings.QDRANT_COLLECTION, tenant_id=doc.tenant_id)
+
+            # after qdrant is up to date: the store only saves re-embedding, a failure here must not leave stale points
+            if added or removed:
+                with track_stage("ingest", "persist_vectors"):
+                    try:
+                        save_document_embeddings(
+                            document_id, added, embeddings if added else [],
+                            keep_hashes=[chunk['content_hash'] for chunk in chunks]
+                        )
+                    except Exception as e:
+                        print(f"failed to persist vectors of document {document_id}: {str(e)}")
 
-        print(f"document {doc_id} ingested successfully")
+            if added or removed or file_type_changed:
+                with track_stage("ingest", "document_index"):
+                    index_document(doc)
 
-        chunk_metadata_list = [
-            ChunkMetaData(
-                chunk_text=chunk['text'],
-                chunk_index=chunk['chunk_index'],
-                chunk_strategy=chunk['strategy']
+            print(f"document {document_id} updated to version {doc.version}")
+
+            return IngestResponse(
+                file_name=file.filename,
+                file_type=file_type,
+                document_id=document_id,
+                message=f"Document {document_id} updated to version {doc.version}",
+                version=doc.version,
+                chunk_count=len(chunks),
+                embedded_chunks=len(added),
+                reused_chunks=len(chunks) - len(added),
+                removed_chunks=len(removed),
+                timings_ms={**current_request_timings(), "total": round((time.perf_counter() - started) * 1000, 2)}
             )
-            for chunk in chunks
-        ]
-
-        return IngestResponse(
-            file_name=file.filename,
-            file_type=file_type,
-            item_id=doc_id,
-            message=f"Document {doc_id} ingested successfully",
-            chunks=len(chunks),
-            total_chunks=chunk_metadata_list
-        )
     except HTTPException:
         raise
     except Exception as e:
         print(f"error: {str(e)}")
         import traceback
         traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"internal server error: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"internal server error: {str(e)}")
+
+
+@router.delete("/{document_id}")
+async def remove_document(document_id: str, db: Session = Depends(get_db)):
+    """
+    Delete a document: its points in qdrant (one filtered delete) and its sqlite rows (one transaction)
+    :return: number of chunks and points removed and the chunk text bytes freed
+    """
+    try:
+        result = delete_document(db, document_id)
+    except Exception as e:
+        print(f"error: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"internal server error: {str(e)}")
+
+    if result is None:
+        raise HTTPException(status_code=404, detail="document not found")
+    print(f"deleted document {document_id}")
+    return result
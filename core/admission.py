@@ -0,0 +1,150 @@
+import math
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from core.configuration import settings
+from core.metrics import registry, QUEUE_DEPTH
+
+LLM_SHED = registry.counter("llm_requests_shed_total", "LLM calls rejected by admission control", labels=("reason",))
+LLM_IN_FLIGHT = registry.gauge("llm_requests_in_flight", "LLM calls currently running")
+
+# absolute time.monotonic() deadline of the current request; None means LLM_REQUEST_DEADLINE_SECONDS per call
+_deadline: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+
+class LLMOverloadedError(Exception):
+    """
+    An LLM call was not admitted (queue full, deadline passed, rate limit) or kept failing until its deadline.
+    Maps to an HTTP error with a Retry-After header; never swallow it as an ordinary LLM failure.
+    """
+
+    def __init__(self, message: str, status_code: int = 503, retry_after: float = 1.0):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+    @property
+    def headers(self):
+        return {"Retry-After": str(max(1, math.ceil(self.retry_after)))}
+
+
+@contextmanager
+def llm_deadline(seconds: Optional[float] = None):
+    """Give every LLM call made inside this block (across threads that copy the context) one shared deadline"""
+    token = _deadline.set(time.monotonic() + (seconds or settings.LLM_REQUEST_DEADLINE_SECONDS))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def current_deadline() -> float:
+    deadline = _deadline.get()
+    return deadline if deadline is not None else time.monotonic() + settings.LLM_REQUEST_DEADLINE_SECONDS
+
+
+def remaining(deadline: float) -> float:
+    return deadline - time.monotonic()
+
+
+class TokenBucket:
+    """Paces calls to `rate` per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, deadline: float) -> float:
+        """
+        Take one token, returning how long the caller must sleep before using it.
+        Raises LLMOverloadedError (429) without taking a token if that wait would pass the deadline.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            wait = max(0.0, (1 - self._tokens) / self.rate)
+            if now + wait > deadline:
+                LLM_SHED.inc(reason="rate_limit")
+                raise LLMOverloadedError("LLM rate limit reached", status_code=429, retry_after=wait)
+            # tokens may go negative: later callers queue behind the ones already waiting
+            self._tokens -= 1
+            return wait
+
+
+class AdmissionController:
+    """
+    Bounds concurrent LLM calls to `limit`, with at most `max_queue` callers waiting for a slot.
+    Callers beyond that are rejected at once (503); waiters give up when their deadline passes.
+    """
+
+    def __init__(self, limit: int, max_queue: int, rate_per_minute: float = 0, burst: int = 0):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.bucket = TokenBucket(rate_per_minute / 60, burst or limit) if rate_per_minute > 0 else None
+        self._active = 0
+        self._waiting = 0
+        self._condition = threading.Condition()
+        self._avg_seconds = 1.0
+
+    def _retry_after(self) -> float:
+        # rough time for the queue ahead to drain
+        return self._avg_seconds * (self._waiting + 1) / max(1, self.limit)
+
+    def check(self):
+        """Reject before doing any work when a new caller could not even queue"""
+        with self._condition:
+            if self._active >= self.limit and self._waiting >= self.max_queue:
+                LLM_SHED.inc(reason="queue_full")
+                raise LLMOverloadedError("LLM queue is full", retry_after=self._retry_after())
+
+    @contextmanager
+    def slot(self, deadline: float):
+        """Hold one of the `limit` slots for the duration of an LLM call"""
+        with self._condition:
+            if self._active >= self.limit:
+                if self._waiting >= self.max_queue:
+                    LLM_SHED.inc(reason="queue_full")
+                    raise LLMOverloadedError("LLM queue is full", retry_after=self._retry_after())
+                self._waiting += 1
+                QUEUE_DEPTH.set(self._waiting, queue="llm")
+                try:
+                    while self._active >= self.limit:
+                        timeout = remaining(deadline)
+                        if timeout <= 0:
+                            LLM_SHED.inc(reason="deadline")
+                            raise LLMOverloadedError("timed out waiting for an LLM slot", retry_after=self._retry_after())
+                        self._condition.wait(timeout)
+                finally:
+                    self._waiting -= 1
+                    QUEUE_DEPTH.set(self._waiting, queue="llm")
+            self._active += 1
+            LLM_IN_FLIGHT.set(self._active)
+
+        started = time.monotonic()
+        try:
+            if self.bucket is not None:
+                wait = self.bucket.reserve(deadline)
+                if wait > 0:
+                    time.sleep(wait)
+            yield
+        finally:
+            with self._condition:
+                self._active -= 1
+                self._avg_seconds = 0.9 * self._avg_seconds + 0.1 * (time.monotonic() - started)
+                LLM_IN_FLIGHT.set(self._active)
+                self._condition.notify()
+
+
+llm_admission = AdmissionController(
+    limit=settings.LLM_MAX_CONCURRENCY,
+    max_queue=settings.LLM_MAX_QUEUE,
+    rate_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+    burst=settings.LLM_RATE_BURST
+)
@@ -1,4 +1,5 @@
 import os
+from typing import Dict, List
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -16,13 +17,89 @@ class Settings(BaseSettings):
     QDRANT_PORT : int = 6333
     QDRANT_COLLECTION : str = "documents"
     QDRANT_URL : str = "http://localhost:6333"
+    # "shared" (one collection, no tenant separation), "payload" (one collection partitioned by tenant_id,
+    # optionally one custom shard key per tenant) or "collection" (one collection per tenant)
+    QDRANT_TENANT_LAYOUT : str = "shared"
+    QDRANT_USE_SHARD_KEYS : bool = False
+    # extra qdrant nodes by name, e.g. QDRANT_ENDPOINTS='{"eu": "http://qdrant-eu:6333"}', and tenants routed to them,
+    # e.g. QDRANT_TENANT_ROUTES='{"acme": "eu"}'; other tenants use QDRANT_HOST:QDRANT_PORT ("default")
+    QDRANT_ENDPOINTS : Dict[str, str] = {}
+    QDRANT_TENANT_ROUTES : Dict[str, str] = {}
+    # false keeps chunk text only in sqlite: qdrant payloads hold ids and filter fields,
+    # and search hydrates the text of the top-k hits in one query
+    QDRANT_STORE_TEXT : bool = True
+    # float16 copy of every chunk vector, keyed by content hash, so collections can be rebuilt without re-embedding
+    EMBEDDING_STORE_ENABLED : bool = True
+    EMBEDDING_STORE_DIR : str = "./embedding_store"
 
     EMBEDDING_MODEL : str = "all-MiniLM-L6-v2"
     EMBEDDING_DIMENSION : int = 384
+    # "torch", "onnx" or "onnx-int8"; the onnx backends need `python -m scripts.export_onnx` first
+    EMBEDDING_BACKEND : str = "torch"
+    EMBEDDING_ONNX_DIR : str = "./model_cache/onnx"
+    EMBEDDING_BATCH_SIZE : int = 32
+    # ingestion-time process pool: 0 disables it, otherwise cores are split evenly between workers
+    EMBEDDING_POOL_WORKERS : int = 0
+    EMBEDDING_POOL_THREADS_PER_WORKER : int = 0
+    EMBEDDING_POOL_SHARD_SIZE : int = 256
+    EMBEDDING_POOL_MIN_TEXTS : int = 512
+    # load the embedding model at import time so a pre-forking server shares it between workers
+    EMBEDDING_PRELOAD : bool = False
+    # torch intra-op threads per worker process, 0 keeps torch's default
+    TORCH_NUM_THREADS : int = 0
 
     GROQ_API_KEY : str =os.getenv("GROQ_API_KEY")
     LLM_MODEL : str = os.getenv("LLM_MODEL")
 
+    # admission control for LLM calls: concurrent calls, callers allowed to wait for one,
+    # and the time budget a chat request has for all its LLM calls including retries
+    LLM_MAX_CONCURRENCY : int = 8
+    LLM_MAX_QUEUE : int = 32
+    LLM_REQUEST_DEADLINE_SECONDS : float = 30.0
+    LLM_MAX_ATTEMPTS : int = 4
+    # provider rate limit to pace calls to, 0 disables pacing; burst defaults to LLM_MAX_CONCURRENCY
+    LLM_REQUESTS_PER_MINUTE : float = 0
+    LLM_RATE_BURST : int = 0
+
+    # POST /api/v1/chat/batch: queries per request and LLM calls in flight per request
+    CHAT_BATCH_MAX_QUERIES : int = 1000
+    CHAT_BATCH_CONCURRENCY : int = 8
+
+    # two-stage retrieval: one centroid per document is kept in a "{QDRANT_COLLECTION}_docs" collection;
+    # with RETRIEVAL_TWO_STAGE, queries first pick RETRIEVAL_TOP_DOCUMENTS documents there, then search only
+    # their chunks. Run scripts.build_document_index once for documents ingested before the index existed
+    DOCUMENT_INDEX_ENABLED : bool = True
+    RETRIEVAL_TWO_STAGE : bool = False
+    RETRIEVAL_TOP_DOCUMENTS : int = 20
+
+    DEFAULT_TENANT : str = "default"
+    # retention: days to keep a document, 0 keeps forever; TENANT_TTL_DAYS overrides per tenant,
+    # e.g. TENANT_TTL_DAYS='{"acme": 30}'; a ttl_days given at upload overrides both
+    DOCUMENT_TTL_DAYS : int = 0
+    TENANT_TTL_DAYS : Dict[str, int] = {}
+    RETENTION_SWEEP_INTERVAL_SECONDS : int = 3600
+
+    # interview slot grid: BOOKING_SLOT_MINUTES slots from BOOKING_DAY_START to BOOKING_DAY_END on BOOKING_WEEKDAYS
+    # (0 = Monday), one grid per interviewer; BOOKING_INTERVIEWERS='["alice", "bob"]', empty means DEFAULT_INTERVIEWER only
+    DEFAULT_INTERVIEWER : str = "default"
+    BOOKING_INTERVIEWERS : List[str] = []
+    BOOKING_DAY_START : str = "09:00"
+    BOOKING_DAY_END : str = "17:00"
+    BOOKING_SLOT_MINUTES : int = 30
+    BOOKING_WEEKDAYS : List[int] = [0, 1, 2, 3, 4]
+    BOOKING_MAX_RANGE_DAYS : int = 31
+
+    METRICS_ENABLED : bool = True
+
+    ADMIN_TOKEN : str = ""
+
+    PROFILING_ENABLED : bool = False
+    PROFILE_SAMPLE_RATE : float = 0.0
+    PROFILE_HEADER : str = "X-Profile-Token"
+    PROFILE_TOKEN : str = ""
+    PROFILE_DIR : str = "./profiles"
+    PROFILE_MAX_FILES : int = 50
+
     class Config:
         env_file = ".env"
 
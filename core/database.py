@@ -1,4 +1,6 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker,declarative_base
 from core.configuration import settings
 
@@ -14,7 +16,38 @@ def get_db():
     finally:
         db.close()
 
+@contextmanager
+def own_session():
+    """
+    A session for work that outlives the request (streamed responses, background threads):
+    get_db's session is closed as soon as the endpoint returns, before a stream is consumed.
+    """
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def _add_missing_columns_and_indexes():
+    """
+    create_all only creates missing tables; add columns and indexes introduced
+    after a table was first created (additive changes only, new columns are nullable).
+    """
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in existing:
+                    column_type = column.type.compile(engine.dialect)
+                    conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+                    print(f"added column {table.name}.{column.name}")
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+
 def init_db():
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns_and_indexes()
     print("database table created")
-
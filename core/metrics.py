@@ -0,0 +1,215 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from core.configuration import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# per-request list of (stage, seconds); None outside of an instrumented request
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+
+def _label_key(label_names: Tuple[str, ...], labels: Dict[str, str]) -> Tuple[str, ...]:
+    return tuple(str(labels.get(name, "")) for name in label_names)
+
+
+def _format_labels(label_names: Tuple[str, ...], key: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{name}="{value}"' for name, value in zip(label_names, key)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.description = description
+        self.label_names = labels
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def get(self, **labels) -> float:
+        return self._values.get(_label_key(self.label_names, labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in items]
+
+
+class Gauge(Counter):
+    """Value that can go up and down (queue depths, in-flight requests)"""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = _label_key(self.label_names, labels)
+        with self._lock:
+            self._values[key] = value
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus layout"""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.label_names = labels
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts..., +Inf count, sum]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(self.label_names, labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            row = self._values.get(key)
+            if row is None:
+                row = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            row[index] += 1
+            row[-1] += value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(row)) for key, row in self._values.items()]
+        lines = []
+        for key, row in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, row):
+                cumulative += count
+                le = f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, le)} {cumulative}")
+            cumulative += row[len(self.buckets)]
+            inf = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, inf)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {row[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Holds every metric of the process and renders them for /metrics"""
+
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, description: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, description, labels))
+
+    def gauge(self, name: str, description: str, labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, description, labels))
+
+    def histogram(self, name: str, description: str, labels: Tuple[str, ...] = (), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, description, labels, buckets))
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_LATENCY = registry.histogram(
+    "rag_stage_duration_seconds", "Time spent in each pipeline stage", labels=("pipeline", "stage")
+)
+REQUEST_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", labels=("method", "route", "status")
+)
+REQUESTS_IN_FLIGHT = registry.gauge("http_requests_in_flight", "Requests currently being served")
+LLM_TOKENS = registry.counter("llm_tokens_total", "LLM tokens consumed", labels=("kind",))
+CACHE_REQUESTS = registry.counter("cache_requests_total", "Cache lookups by result", labels=("cache", "result"))
+QUEUE_DEPTH = registry.gauge("queue_depth", "Work items waiting in internal queues", labels=("queue",))
+STARTUP_SECONDS = registry.gauge("startup_duration_seconds", "Time spent in startup steps", labels=("step",))
+PROCESS_MEMORY = registry.gauge("process_memory_bytes", "Memory of this worker process", labels=("kind",))
+
+
+def process_memory() -> Dict[str, int]:
+    """
+    Resident (rss) and proportional (pss) memory of this process in bytes.
+    Pss splits pages shared with other workers (e.g. model weights loaded before fork) between them,
+    so summing pss over workers gives the real footprint.
+    """
+    memory: Dict[str, int] = {}
+    try:
+        with open("/proc/self/smaps_rollup") as f:
+            for line in f:
+                field, _, value = line.partition(":")
+                if field in ("Rss", "Pss", "Shared_Clean", "Shared_Dirty"):
+                    memory[field.lower()] = int(value.split()[0]) * 1024
+    except OSError:
+        import resource
+        memory["rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return memory
+
+
+@contextmanager
+def track_stage(pipeline: str, stage: str):
+    """
+    Time a pipeline stage into the stage histogram and the current request's Server-Timing list.
+    :param pipeline: "ingest" or "chat"
+    :param stage: stage name, e.g. "embed"
+    """
+    if not settings.METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, pipeline=pipeline, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((stage, elapsed))
+
+
+def start_request_timings() -> List[Tuple[str, float]]:
+    """Begin collecting stage timings for the current request"""
+    timings: List[Tuple[str, float]] = []
+    _request_timings.set(timings)
+    return timings
+
+
+def current_request_timings() -> Dict[str, float]:
+    """Stage timings (in milliseconds) collected so far for the current request"""
+    timings = _request_timings.get() or []
+    result: Dict[str, float] = {}
+    for stage, seconds in timings:
+        result[stage] = round(result.get(stage, 0.0) + seconds * 1000, 2)
+    return result
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Format collected stage timings as a Server-Timing header value"""
+    return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings)
@@ -0,0 +1,65 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+
+def encode_cursor(timestamp: datetime, row_id: Any) -> str:
+    """Opaque cursor pointing just after the row with this (timestamp, id)"""
+    raw = json.dumps([timestamp.isoformat(), row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, Any]:
+    try:
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(timestamp), row_id
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def encode_position_cursor(position: int) -> str:
+    """Opaque cursor pointing just after the row at this position (for lists with a unique ascending order)"""
+    return base64.urlsafe_b64encode(json.dumps([position]).encode("utf-8")).decode("ascii")
+
+
+def decode_position_cursor(cursor: str) -> int:
+    try:
+        (position,) = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return int(position)
+    except Exception:
+        raise ValueError("invalid cursor")
+
+
+def keyset_page(query, ts_column, id_column, cursor: Optional[str], limit: int) -> Tuple[List, Optional[str]]:
+    """
+    One page of `query`, newest first, using keyset (seek) pagination on (ts_column, id_column).
+    Each page is an index range scan, so its cost does not grow with the page number or the table size.
+    :return: (rows, cursor of the next page or None)
+    """
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            ts_column < timestamp,
+            and_(ts_column == timestamp, id_column < row_id)
+        ))
+
+    rows = query.order_by(ts_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, ts_column.key), getattr(last, id_column.key))
+
+
+def iter_keyset(query, ts_column, id_column, batch_size: int = 500):
+    """Yield every row of `query`, newest first, fetching one keyset page at a time"""
+    cursor = None
+    while True:
+        rows, cursor = keyset_page(query, ts_column, id_column, cursor, batch_size)
+        yield from rows
+        if cursor is None:
+            return
@@ -0,0 +1,104 @@
+import cProfile
+import hmac
+import io
+import os
+import pstats
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from core.configuration import settings
+
+# set per request by the middleware; read by profile_scope deeper in the call tree
+_profile_requested: ContextVar[bool] = ContextVar("profile_requested", default=False)
+
+# cProfile can only profile one call tree per process reliably, so overlapping requests are skipped
+_profile_lock = threading.Lock()
+
+
+def mark_request_for_profiling(headers) -> bool:
+    """
+    Decide whether the current request should be profiled.
+    A request is profiled when it carries the configured header with the right token,
+    or when it is picked by PROFILE_SAMPLE_RATE.
+    """
+    token = headers.get(settings.PROFILE_HEADER)
+    selected = bool(
+        token and settings.PROFILE_TOKEN and hmac.compare_digest(token, settings.PROFILE_TOKEN)
+    ) or (settings.PROFILE_SAMPLE_RATE > 0 and random.random() < settings.PROFILE_SAMPLE_RATE)
+    _profile_requested.set(selected)
+    return selected
+
+
+@contextmanager
+def profile_scope(name: str):
+    """
+    Run the enclosed block under cProfile when the current request was selected for profiling.
+    :param name: label used in the profile file name, e.g. "process_query"
+    """
+    if not _profile_requested.get() or not _profile_lock.acquire(blocking=False):
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        _profile_lock.release()
+        _save_profile(profiler, name)
+
+
+def _save_profile(profiler: cProfile.Profile, name: str):
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    file_name = f"{time.strftime('%Y%m%d-%H%M%S')}_{name}_{uuid.uuid4().hex[:8]}.prof"
+    profiler.dump_stats(os.path.join(settings.PROFILE_DIR, file_name))
+    print(f"saved profile {file_name}")
+    _prune_profiles()
+
+
+def _prune_profiles():
+    profiles = list_profiles()
+    for profile in profiles[settings.PROFILE_MAX_FILES:]:
+        try:
+            os.remove(os.path.join(settings.PROFILE_DIR, profile["name"]))
+        except OSError:
+            pass
+
+
+def list_profiles() -> List[Dict]:
+    """List stored profiles, newest first"""
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(settings.PROFILE_DIR):
+        if entry.is_file() and entry.name.endswith(".prof"):
+            stat = entry.stat()
+            profiles.append({
+                "name": entry.name,
+                "size_bytes": stat.st_size,
+                "created_at": stat.st_mtime
+            })
+    profiles.sort(key=lambda p: p["created_at"], reverse=True)
+    return profiles
+
+
+def get_profile_path(name: str) -> Optional[str]:
+    """Resolve a profile name to its path, refusing anything outside PROFILE_DIR"""
+    safe_name = os.path.basename(name)
+    path = os.path.join(settings.PROFILE_DIR, safe_name)
+    if safe_name != name or not safe_name.endswith(".prof") or not os.path.isfile(path):
+        return None
+    return path
+
+
+def profile_summary(path: str, limit: int = 40, sort_by: str = "cumulative") -> str:
+    """Human readable top-N functions of a stored profile"""
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).sort_stats(sort_by).print_stats(limit)
+    return out.getvalue()
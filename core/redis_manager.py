@@ -2,6 +2,7 @@ import redis
 import json
 from typing import List, Dict, Optional
 from core.configuration import settings
+from core.metrics import CACHE_REQUESTS
 
 class RedisManager:
     """Manage chat memory using Redis"""
@@ -43,7 +44,9 @@ class RedisManager:
         """Get formatted context for LLM from the last N messages"""
         history = self.get_history(session_id)
         if not history:
+            CACHE_REQUESTS.inc(cache="chat_history", result="miss")
             return ""
+        CACHE_REQUESTS.inc(cache="chat_history", result="hit")
 
         recent = history[-last_n:]
         context = "Previous conversation:\n"
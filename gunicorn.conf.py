@@ -0,0 +1,15 @@
+# gunicorn -c gunicorn.conf.py main:app
+# With EMBEDDING_PRELOAD=true the embedding model is loaded once in the master process (preload_app)
+# and shared copy-on-write by every forked worker.
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def post_fork(server, worker):
+    # torch thread pools are per process; size them after the fork so workers don't oversubscribe cores
+    from services.embeddings import configure_torch_threads
+    configure_torch_threads()
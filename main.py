@@ -1,40 +1,133 @@
 from collections.abc import AsyncGenerator
 from contextlib import asynccontextmanager
+import asyncio
+import time
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse, JSONResponse
 
+from core.admission import LLMOverloadedError
 from core.database import init_db
 from core.configuration import settings
+from core.profiling import mark_request_for_profiling
+from core.metrics import (
+    registry, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, STARTUP_SECONDS, PROCESS_MEMORY,
+    start_request_timings, server_timing_header, process_memory
+)
 
 from services.vectorsStore import init_qdrant_collection
-from services.embeddings import get_embedding_dim
+from services.embeddings import get_embedding_dim, preload_model, warm_up
+from services.embedding_pool import get_embedding_pool, shutdown_embedding_pool
+from services.retention import sweep_expired_documents
+from services.booking import BookingService
 
 from api.docIngestion import router  as doc_ingestion_router
 
 from api.conversationalRAG import router as chat_router
 from api.booking_api import router as booking_router
+from api.admin_api import router as admin_router
+
+_import_start = time.perf_counter()
+
+# with gunicorn --preload (see gunicorn.conf.py) this runs once in the master process,
+# so forked workers share the model weights copy-on-write instead of loading their own copy
+if settings.EMBEDDING_PRELOAD:
+    preload_model()
+    STARTUP_SECONDS.set(time.perf_counter() - _import_start, step="preload")
+    print(f"preloaded embedding model in {time.perf_counter() - _import_start:.2f}s")
+
+async def retention_sweeper(interval: float):
+    """Delete expired documents every `interval` seconds until cancelled"""
+    while True:
+        try:
+            await asyncio.to_thread(sweep_expired_documents)
+        except Exception as e:
+            print(f"retention sweep failed: {str(e)}")
+        await asyncio.sleep(interval)
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> AsyncGenerator[None,None]:
     print("\n1. initializing sqlite database")
     init_db()
-    print("\n2. initializing qdrant vector database")
+    BookingService.backfill_slots()
+    print("\n2. warming up embedding model")
+    warm_up_seconds = warm_up()
+    STARTUP_SECONDS.set(warm_up_seconds, step="warm_up")
+    memory = process_memory()
+    print(f"model ready in {warm_up_seconds:.2f}s, rss {memory.get('rss', 0) / 2**20:.0f} MiB, "
+          f"pss {memory.get('pss', 0) / 2**20:.0f} MiB")
+    print("\n3. initializing qdrant vector database")
     embedding_dim = get_embedding_dim()
     print(f"embedding dimension : {embedding_dim}")
 
     init_qdrant_collection(
         collection_name = settings.QDRANT_COLLECTION,
-        vector_size = embedding_dim,
-        qdrant_host = settings.QDRANT_HOST,
-        qdrant_port = settings.QDRANT_PORT
+        vector_size = embedding_dim
     )
+    if settings.EMBEDDING_POOL_WORKERS > 0:
+        print("\n4. starting embedding worker pool")
+        get_embedding_pool()
+    sweeper = None
+    if settings.RETENTION_SWEEP_INTERVAL_SECONDS > 0:
+        sweeper = asyncio.create_task(retention_sweeper(settings.RETENTION_SWEEP_INTERVAL_SECONDS))
     yield
+    if sweeper is not None:
+        sweeper.cancel()
+    shutdown_embedding_pool()
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 app.include_router(doc_ingestion_router)
 app.include_router(chat_router)
 app.include_router(booking_router)
+app.include_router(admin_router)
+
+
+@app.exception_handler(LLMOverloadedError)
+async def llm_overloaded_handler(request: Request, exc: LLMOverloadedError):
+    """Shed load with 429/503 and a Retry-After hint instead of a 500"""
+    return JSONResponse(status_code=exc.status_code, content={"detail": str(exc)}, headers=exc.headers)
+
+
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """Record request latency and expose per-stage timings in a Server-Timing header"""
+    if settings.PROFILING_ENABLED:
+        mark_request_for_profiling(request.headers)
+
+    if not settings.METRICS_ENABLED:
+        return await call_next(request)
+
+    timings = start_request_timings()
+    REQUESTS_IN_FLIGHT.inc()
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - start
+        REQUESTS_IN_FLIGHT.dec()
+        route = request.scope.get("route")
+        REQUEST_LATENCY.observe(
+            elapsed,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=status
+        )
+
+    timings.append(("total", elapsed))
+    response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint"""
+    for kind, value in process_memory().items():
+        PROCESS_MEMORY.set(value, kind=kind)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.get('/health')
 async def health_check():
@@ -69,9 +162,4 @@ def read_root():
     }
 
 
-@app.on_event("startup")
-def on_startup():
-    init_db()
-
-
 
@@ -1,13 +1,25 @@
-from sqlalchemy import Column, Integer, String,DateTime
+from sqlalchemy import Column, Integer, String, DateTime, Date, Time, Index
 from core.database import Base
 from datetime import datetime
 
 class Booking(Base):
     __tablename__ ="bookingInfo"
+    __table_args__ = (
+        # keyset pagination of the listing (newest first) and of lookups by email
+        Index("ix_booking_created_id", "created_at", "id"),
+        Index("ix_booking_email_created_id", "email", "created_at", "id"),
+        # one booking per interviewer slot: concurrent writes for the same slot fail on insert instead of
+        # double-booking, and availability lookups are range scans over (interviewer, date)
+        Index("ux_booking_slot", "interviewer_id", "slot_date", "slot_time", unique=True),
+    )
 
     id = Column(Integer,primary_key=True, index = True)
     name = Column(String,nullable=False)
     email = Column(String,nullable=False)
+    # free-form text of the requested slot, kept for rows written before the typed slot columns
     booking_date = Column(String,nullable=False)
     booking_time = Column(String, nullable=False)
-    created_at = Column(DateTime, default=datetime.now)
\ No newline at end of file
+    interviewer_id = Column(String, nullable=True)
+    slot_date = Column(Date, nullable=True)
+    slot_time = Column(Time, nullable=True)
+    created_at = Column(DateTime, default=datetime.now)
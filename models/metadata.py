@@ -1,10 +1,15 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from core.database import Base
 
 class DocMetaData(Base):
     __tablename__= "documentsInfo"
+    __table_args__ = (
+        Index("ix_documents_upload_id", "upload_time", "id"),
+        # retention sweeps: explicit expiry, and tenant policies applied by upload time
+        Index("ix_documents_tenant_upload", "tenant_id", "upload_time"),
+    )
 
     id = Column(Integer, primary_key=True, index = True)
     document_id = Column(String,unique=True, index = True)
@@ -14,15 +19,25 @@ class DocMetaData(Base):
     chunk_count = Column(Integer, nullable=False)
     chunking_strategy = Column(String, nullable = False)
     chunk_size = Column(Integer,nullable = False)
+    version = Column(Integer, default=1)
+    updated_time = Column(DateTime, nullable=True)
+    tenant_id = Column(String, nullable=True)
+    expires_at = Column(DateTime, nullable=True, index = True)
     chunks = relationship("ChunkMetadata",back_populates="document")
 
 class ChunkMetadata(Base):
     __tablename__ = "chunks"
+    __table_args__ = (
+        # chunk listings page through a document in chunk order
+        Index("ix_chunks_document_index", "document_id", "chunk_index"),
+    )
 
     id = Column(Integer, primary_key=True, index = True)
     chunk_id = Column(String, unique=True, index = True)
-    document_id = Column(String, ForeignKey('documentsInfo.document_id'))
+    document_id = Column(String, ForeignKey('documentsInfo.document_id'), index = True)
     chunk_index = Column(Integer,nullable=False)
     text = Column(Text, nullable = False)
     char_count = Column(Integer, nullable = False)
+    # sha256 of the chunk text; NULL for chunks ingested before re-ingestion existed
+    content_hash = Column(String, nullable=True)
     document = relationship("DocMetaData",back_populates="chunks")
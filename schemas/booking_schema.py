@@ -9,6 +9,7 @@ class BookingRequest(BaseModel):
     email: EmailStr = Field(..., description="Candidate's email address")
     booking_date: date = Field(..., description="Preferred date for interview")
     booking_time: time = Field(..., description="Preferred time for interview")
+    interviewer_id: Optional[str] = Field(default=None, description="Interviewer to book (one of BOOKING_INTERVIEWERS), any free interviewer if omitted")
 
     class Config:
         schema_extra = {
@@ -28,6 +29,7 @@ class BookingResponse(BaseModel):
     email: EmailStr
     booking_date: date
     booking_time: time
+    interviewer_id: Optional[str] = None
     message: str = Field(default="Interview booking confirmed successfully")
 
     class Config:
@@ -49,8 +51,9 @@ class BookingListItem(BaseModel):
     id: int
     name: str
     email: str
-    booking_date: date
-    booking_time: time
+    booking_date: Optional[date] = None
+    booking_time: Optional[time] = None
+    interviewer_id: Optional[str] = None
     created_at: Optional[str] = None
 
     class Config:
@@ -58,5 +61,18 @@ class BookingListItem(BaseModel):
 
 
 class BookingListResponse(BaseModel):
-    total: int = Field(...,description="Total number of bookings")
-    bookings: list[BookingListItem] = Field(...,description="List of all bookings")
\ No newline at end of file
+    total: int = Field(...,description="Number of bookings in this page")
+    bookings: list[BookingListItem] = Field(...,description="Bookings in this page, newest first")
+    next_cursor: Optional[str] = Field(default=None, description="Cursor of the next page, null on the last page")
+
+class SlotItem(BaseModel):
+    interviewer_id: str
+    slot_date: date
+    slot_time: time
+
+
+class AvailabilityResponse(BaseModel):
+    date_from: date
+    date_to: date
+    total: int = Field(..., description="Number of free slots returned")
+    slots: list[SlotItem] = Field(..., description="Free slots, earliest first")
@@ -1,9 +1,38 @@
 from pydantic import BaseModel,Field
 from typing import Optional, List
+from datetime import datetime
+
+class RetrievalFilter(BaseModel):
+    document_ids : Optional[List[str]] = Field(default=None, description="Only search these documents")
+    file_type : Optional[str] = Field(default=None, description="Only search documents of this type, e.g. 'pdf'")
+    chunking_strategy : Optional[str] = Field(default=None, description="Only search chunks made with this strategy")
+    uploaded_after : Optional[datetime] = None
+    uploaded_before : Optional[datetime] = None
 
 class ChatRequest(BaseModel):
     session_id : Optional[str] = None
+    tenant_id : Optional[str] = Field(default=None, description="Only search this tenant's documents (every layout; in 'shared' only when given)")
+    query : str
+    filters : Optional[RetrievalFilter] = Field(default=None, description="Restrict document retrieval")
+
+class BatchQuery(BaseModel):
+    id : Optional[str] = Field(default=None, description="Caller's id, echoed back with the result")
     query : str
+    filters : Optional[RetrievalFilter] = Field(default=None, description="Overrides the batch filters for this query")
+
+class BatchChatRequest(BaseModel):
+    tenant_id : Optional[str] = Field(default=None, description="Only search this tenant's documents (every layout; in 'shared' only when given)")
+    queries : List[BatchQuery] = Field(min_length=1)
+    filters : Optional[RetrievalFilter] = Field(default=None, description="Filters for queries without their own")
+    top_k : int = Field(default=3, ge=1, le=20)
+
+class BatchChatResult(BaseModel):
+    index : int
+    id : Optional[str] = None
+    query : str
+    answer : Optional[str] = None
+    sources : List[str] = Field(default_factory=list)
+    error : Optional[str] = None
 
 class ChatResponse(BaseModel):
     session_id : str
@@ -1,10 +1,12 @@
 from pydantic import BaseModel, Field
-from typing import List
+from typing import Dict, List, Optional
 
 class ChunkMetaData(BaseModel):
     chunk_text: str = Field(..., min_length=1, description="Content of the data chunk")
     chunk_index: int = Field(..., ge=0, description="Zero-based index of chunk in file")
     chunk_strategy: str = Field(..., min_length=2, description="Strategy used to chunk the file")
+    chunk_id: Optional[str] = Field(default=None, description="Stable identifier of the chunk")
+    char_count: Optional[int] = Field(default=None, description="Length of the chunk text in characters")
 
     class Config:
         from_attributes = True
@@ -12,13 +14,41 @@ class ChunkMetaData(BaseModel):
 class IngestResponse(BaseModel):
     file_name: str = Field(..., description="Name of ingested file")
     file_type: str = Field(..., min_length=1, description="Type of ingested file")
-    item_id: str = Field(..., description="Unique identifier for ingested document")
+    document_id: str = Field(..., description="Unique identifier for ingested document")
     message: str = Field(..., description="Detailed message about document/text ingestion")
-    total_chunks: List[ChunkMetaData] = Field(..., description="List of all chunk metadata")
+    version: Optional[int] = Field(default=None, description="Version of the document after this ingestion")
+    chunk_count: int = Field(..., ge=0, description="Number of chunks of the document")
+    embedded_chunks: int = Field(..., ge=0, description="Chunks embedded and upserted by this ingestion")
+    reused_chunks: int = Field(default=0, ge=0, description="Chunks kept from the previous version without re-embedding")
+    removed_chunks: int = Field(default=0, ge=0, description="Chunks of the previous version that were deleted")
+    timings_ms: Dict[str, float] = Field(default_factory=dict, description="Time spent per ingestion stage, in milliseconds")
 
-    @property
-    def chunks(self) -> int:
-        return len(self.total_chunks)
+    class Config:
+        from_attributes = True
+
+
+class ChunkListResponse(BaseModel):
+    document_id: str
+    total: int = Field(..., description="Number of chunks of the document")
+    chunks: List[ChunkMetaData] = Field(..., description="Chunks in this page, in document order")
+    next_cursor: Optional[str] = Field(default=None, description="Cursor of the next page, null on the last page")
+
+
+class DocumentListItem(BaseModel):
+    document_id: str
+    file_name: str
+    file_type: str
+    chunk_count: int
+    chunking_strategy: str
+    chunk_size: int
+    version: Optional[int] = None
+    upload_time: Optional[str] = None
 
     class Config:
         from_attributes = True
+
+
+class DocumentListResponse(BaseModel):
+    total: int = Field(..., description="Number of documents in this page")
+    documents: List[DocumentListItem] = Field(..., description="Documents in this page, newest upload first")
+    next_cursor: Optional[str] = Field(default=None, description="Cursor of the next page, null on the last page")
@@ -0,0 +1,105 @@
+"""
+Chunking throughput and memory on multi-megabyte texts, after checking that no strategy drops text.
+
+    python -m scripts.benchmark_chunking
+    python -m scripts.benchmark_chunking --megabytes 16 --file big.txt
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from services.chunking import chunk_spans, chunk_text
+
+
+def make_text(megabytes: float) -> str:
+    rng = random.Random(0)
+    words = ("retrieval vector document embedding latency interview qdrant sqlite redis cache "
+             "naïve café straße 東京 данные").split()
+    parts, size = [], 0
+    while size < megabytes * 2**20:
+        sentence = " ".join(rng.choice(words) for _ in range(rng.randint(4, 30))) + rng.choice(".!?") + " "
+        if rng.random() < 0.05:
+            sentence += "\n\n"
+        parts.append(sentence)
+        size += len(sentence)
+    return "".join(parts)
+
+
+def uncovered(text: str, spans) -> int:
+    """Number of non-whitespace characters outside every span"""
+    covered = bytearray(len(text))
+    for start, end in spans:
+        covered[start:end] = b"\x01" * (end - start)
+    return sum(1 for i, ch in enumerate(text) if not covered[i] and not ch.isspace())
+
+
+def check_coverage(strategies, chunk_size: int, overlaps) -> bool:
+    """Chunk texts with few or no spaces (CJK, long unbroken runs) and report text that no chunk contains"""
+    samples = {
+        "cjk": "这是一个测试句子。" * 1000,
+        "run": "x" * 5000 + " tail " + "y" * 3000,
+        "mixed": " ".join(["word"] * 50 + ["z" * 1200] + ["word"] * 50),
+    }
+    ok = True
+    for strategy in strategies:
+        size = min(chunk_size, 256) if strategy == "token" else chunk_size
+        for name, text in samples.items():
+            try:
+                missing = uncovered(text, chunk_spans(text, strategy, size, overlaps[strategy]))
+            except Exception as e:
+                print(f"coverage {strategy}/{name} skipped: {e}")
+                break
+            if missing:
+                ok = False
+                print(f"coverage {strategy}/{name}: {missing} of {len(text)} characters in no chunk")
+    return ok
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=float, default=8)
+    parser.add_argument("--file", help="benchmark on this text file instead of generated text")
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--strategies", nargs="+", default=["sentence", "fixed", "token"])
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text = make_text(args.megabytes)
+    print(f"text: {len(text) / 2**20:.1f}M characters")
+
+    overlaps = {"sentence": 100, "fixed": 128, "token": 32}
+    if "token" in args.strategies:
+        # load the tokenizer up front so model loading is not timed
+        from services.embeddings import get_tokenizer
+        get_tokenizer()
+    if not check_coverage(args.strategies, args.chunk_size, overlaps):
+        raise SystemExit("chunking drops text")
+    print(f"{'strategy':10s} {'mode':8s} {'chunks':>8s} {'chunks/sec':>12s} {'MB/sec':>8s} {'peak alloc':>12s}")
+    for strategy in args.strategies:
+        chunk_size = min(args.chunk_size, 256) if strategy == "token" else args.chunk_size
+        for mode, fn in (("spans", chunk_spans), ("chunks", chunk_text)):
+            try:
+                result, elapsed, peak = measure(lambda: fn(text, strategy, chunk_size, overlaps[strategy]))
+            except Exception as e:
+                print(f"{strategy:10s} skipped: {e}")
+                break
+            print(f"{strategy:10s} {mode:8s} {len(result):8d} {len(result) / elapsed:12.0f} "
+                  f"{len(text) / 2**20 / elapsed:8.1f} {peak / 2**20:10.1f}MB")
+
+
+if __name__ == "__main__":
+    main()
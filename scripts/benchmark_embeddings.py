@@ -0,0 +1,48 @@
+"""
+Embedding throughput per backend, in sentences/sec.
+
+    python -m scripts.benchmark_embeddings
+    python -m scripts.benchmark_embeddings --backends torch onnx-int8 --sentences 2048
+"""
+import argparse
+import time
+
+from services.embedding_backends import create_backend
+
+BATCH_SIZES = (1, 32, 256)
+
+
+def make_sentences(count: int):
+    words = ("vector search retrieval document chunk embedding model latency query answer "
+             "context interview booking qdrant redis sqlite").split()
+    return [" ".join(words[(i + j) % len(words)] for j in range(8 + i % 40)) for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx", "onnx-int8"])
+    parser.add_argument("--sentences", type=int, default=1024)
+    args = parser.parse_args()
+
+    sentences = make_sentences(args.sentences)
+    print(f"{'backend':10s} " + " ".join(f"{'batch ' + str(b):>12s}" for b in BATCH_SIZES))
+    for name in args.backends:
+        try:
+            backend = create_backend(name)
+        except Exception as e:
+            print(f"{name:10s} skipped: {e}")
+            continue
+        backend.encode(sentences[:32], batch_size=32)  # warm up
+
+        rates = []
+        for batch_size in BATCH_SIZES:
+            # batch size 1 is slow, a smaller sample is enough
+            sample = sentences[:256] if batch_size == 1 else sentences
+            start = time.perf_counter()
+            backend.encode(sample, batch_size=batch_size)
+            rates.append(len(sample) / (time.perf_counter() - start))
+        print(f"{backend.name:10s} " + " ".join(f"{rate:12.1f}" for rate in rates))
+
+
+if __name__ == "__main__":
+    main()
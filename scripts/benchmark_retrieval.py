@@ -0,0 +1,94 @@
+"""
+Two-stage (document index, then chunks) against flat chunk search: recall@k of the two-stage results
+relative to flat search, distinct documents in the top k, and per-query latency. Queries are chunk texts
+sampled from the corpus.
+
+    python -m scripts.benchmark_retrieval
+    python -m scripts.benchmark_retrieval --queries 200 --top-k 5 --depths 5 20 50 --tenant acme
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+
+def percentile(samples, q):
+    return float(np.percentile(samples, q)) * 1000 if samples else 0.0
+
+
+def sample_queries(count: int, tenant_id=None):
+    from core.database import SessionLocal
+    from models.metadata import ChunkMetadata, DocMetaData
+
+    db = SessionLocal()
+    try:
+        query = db.query(ChunkMetadata.text)
+        if tenant_id:
+            query = query.join(DocMetaData, DocMetaData.document_id == ChunkMetadata.document_id).filter(
+                DocMetaData.tenant_id == tenant_id
+            )
+        total = query.count()
+        # random offsets instead of ORDER BY RANDOM(), which sorts the whole table
+        offsets = random.sample(range(total), min(count, total))
+        return [query.offset(offset).limit(1).scalar() for offset in offsets]
+    finally:
+        db.close()
+
+
+def run(label, search, embeddings, reference=None):
+    latencies, results = [], []
+    for embedding in embeddings:
+        start = time.perf_counter()
+        results.append(search(embedding))
+        latencies.append(time.perf_counter() - start)
+
+    recall = "-"
+    if reference is not None:
+        found = total = 0
+        for expected, actual in zip(reference, results):
+            expected_ids = {hit["id"] for hit in expected}
+            found += len(expected_ids & {hit["id"] for hit in actual})
+            total += len(expected_ids)
+        recall = f"{found / total:.3f}" if total else "1.000"
+    documents = np.mean([len({hit["document_id"] for hit in hits}) for hits in results]) if results else 0
+    print(f"{label:16s} {recall:>8s} {documents:8.2f} {percentile(latencies, 50):9.2f} {percentile(latencies, 95):9.2f}")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--depths", type=int, nargs="+", default=[5, 20, 50], help="documents kept by the first stage")
+    parser.add_argument("--tenant", default=None)
+    args = parser.parse_args()
+
+    import main  # noqa: F401  (registers the models)
+    from core.configuration import settings
+    from services.embeddings import encode_texts
+    from services.vectorsStore import search_similar_chunks, search_two_stage
+
+    texts = sample_queries(args.queries, args.tenant)
+    if not texts:
+        print("no chunks to sample queries from")
+        return
+    embeddings = encode_texts(texts)
+    collection = settings.QDRANT_COLLECTION
+
+    print(f"{len(texts)} queries, top_k={args.top_k}")
+    print(f"{'search':16s} {'recall':>8s} {'docs/q':>8s} {'p50 ms':>9s} {'p95 ms':>9s}")
+    flat = run(
+        "flat", lambda e: search_similar_chunks(e, args.top_k, collection, tenant_id=args.tenant), embeddings
+    )
+    for depth in args.depths:
+        run(
+            f"two-stage n={depth}",
+            lambda e: search_two_stage([e], args.top_k, collection, tenant_id=args.tenant, top_documents=depth)[0],
+            embeddings,
+            reference=flat
+        )
+
+
+if __name__ == "__main__":
+    main()
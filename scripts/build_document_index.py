@@ -0,0 +1,18 @@
+"""
+Write the centroid of every stored document to the document index ("{QDRANT_COLLECTION}_docs"),
+for documents ingested before it existed. Vectors come from the embedding store, else from qdrant.
+
+    python -m scripts.build_document_index
+"""
+import json
+
+
+def main():
+    import main  # noqa: F401  (registers the models)
+    from services.document_index import build_document_index
+
+    print(json.dumps(build_document_index(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Check tenant routing and isolation against several local in-memory Qdrant instances, for every layout.
+Needs no running Qdrant, sqlite data or embedding model.
+
+    python -m scripts.check_tenant_routing
+"""
+import warnings
+
+import numpy as np
+
+from core.configuration import settings
+import services.vectorsStore as vs
+
+DIMENSION = 16
+# "acme.eu"/"acme_eu" only differ in characters a collection name can't hold; "docs" would collide with the
+# default tenant's document index under a naive "<collection>_<tenant>" naming
+TENANTS = {
+    "acme": "node_a", "globex": "node_a", "acme.eu": "node_a", "acme_eu": "node_a", "initech": "node_b",
+    "docs": "default", settings.DEFAULT_TENANT: "default"
+}
+
+
+def _reset(layout: str):
+    settings.QDRANT_TENANT_LAYOUT = layout
+    settings.QDRANT_ENDPOINTS = {"default": ":memory:", "node_a": ":memory:", "node_b": ":memory:"}
+    settings.QDRANT_TENANT_ROUTES = {tenant: node for tenant, node in TENANTS.items() if node != "default"}
+    vs._clients.clear()
+    vs._known_collections.clear()
+
+
+def _ingest(tenant: str, rng) -> np.ndarray:
+    doc_id = f"{tenant}-doc"
+    chunks = [
+        {"chunk_id": f"{doc_id}_{i}", "chunk_index": i, "text": f"{tenant} chunk {i}", "strategy": "fixed", "char_count": 10}
+        for i in range(5)
+    ]
+    embeddings = rng.normal(size=(5, DIMENSION)).astype(np.float32)
+    vs.store_embeddings(chunks, embeddings.tolist(), doc_id, settings.QDRANT_COLLECTION, "txt", tenant_id=tenant)
+    vs.store_document_vector(doc_id, embeddings, settings.QDRANT_COLLECTION, "txt", "fixed", tenant_id=tenant)
+    return embeddings
+
+
+def check_layout(layout: str):
+    _reset(layout)
+    rng = np.random.default_rng(0)
+    vectors = {tenant: _ingest(tenant, rng) for tenant in TENANTS}
+
+    for tenant, node in TENANTS.items():
+        target = vs.resolve_target(tenant, settings.QDRANT_COLLECTION)
+        assert target.endpoint == node, (layout, tenant, target.endpoint)
+
+        # every hit, even for another tenant's exact vector, must belong to the tenant searched
+        for other, embeddings in vectors.items():
+            hits = vs.search_similar_chunks(embeddings[0], top_k=20, collection_name=settings.QDRANT_COLLECTION, tenant_id=tenant)
+            hits += vs.search_two_stage(embeddings[:1], top_k=20, collection_name=settings.QDRANT_COLLECTION, tenant_id=tenant)[0]
+            owners = {hit["document_id"] for hit in hits}
+            if layout == "shared":
+                # no separation inside a node: tenants sharing a node see each other
+                sharing = {f"{t}-doc" for t, n in TENANTS.items() if n == node}
+                assert owners <= sharing, (layout, tenant, owners)
+            else:
+                assert owners == {f"{tenant}-doc"}, (layout, tenant, other, owners)
+
+    # nothing routed elsewhere leaks onto a node
+    for node in ("default", "node_a", "node_b"):
+        client = vs.get_endpoint_client(node)
+        stored = set()
+        for collection in client.get_collections().collections:
+            points, _ = client.scroll(collection.name, limit=100, with_payload=["tenant_id"])
+            stored |= {point.payload["tenant_id"] for point in points}
+        assert stored == {t for t, n in TENANTS.items() if n == node}, (layout, node, stored)
+
+    # maintenance (startup indexes, compaction, payload slimming) reaches every collection on every node
+    maintained = {(t.endpoint, t.collection_name) for name in (settings.QDRANT_COLLECTION, vs.document_index_name(settings.QDRANT_COLLECTION))
+                  for t in vs.stored_targets(name)}
+    existing = {(node, c.name) for node in vs.qdrant_endpoints() for c in vs.get_endpoint_client(node).get_collections().collections}
+    assert maintained == existing, (layout, existing - maintained)
+
+    collections = {node: sorted(c.name for c in vs.get_endpoint_client(node).get_collections().collections)
+                   for node in ("default", "node_a", "node_b")}
+    print(f"{layout:<10} ok  {collections}")
+
+
+def main():
+    warnings.filterwarnings("ignore", message="Payload indexes have no effect")
+    for layout in vs.TENANT_LAYOUTS:
+        check_layout(layout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Delete expired documents, then VACUUM sqlite and trigger qdrant optimization, printing the bytes reclaimed.
+
+    python -m scripts.compact
+    python -m scripts.compact --no-sweep --wait 0
+"""
+import argparse
+import json
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--no-sweep", action="store_true", help="skip deleting expired documents first")
+    parser.add_argument("--wait", type=float, default=60, help="seconds to wait for qdrant optimization to finish")
+    args = parser.parse_args()
+
+    import main  # noqa: F401  (registers the models)
+    from services.retention import compact_storage, sweep_expired_documents
+
+    if not args.no_sweep:
+        print(json.dumps({"sweep": sweep_expired_documents()}, indent=2))
+    print(json.dumps({"compact": compact_storage(wait_seconds=args.wait)}, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+Export the configured SentenceTransformer to ONNX (fp32 and dynamically quantized int8)
+and check that both agree with the torch model.
+
+    python -m scripts.export_onnx
+    python -m scripts.export_onnx --output ./model_cache/onnx --sentences my_samples.txt
+"""
+import argparse
+import json
+import os
+
+from core.configuration import settings
+from services.embedding_backends import (
+    TorchBackend, OnnxBackend, cosine_agreement,
+    ONNX_MODEL_FILE, ONNX_INT8_MODEL_FILE, ONNX_CONFIG_FILE
+)
+
+SAMPLE_SENTENCES = [
+    "What is the refund policy for annual subscriptions?",
+    "Book an interview for John Doe on 2025-11-15 at 10:00.",
+    "The mitochondria is the powerhouse of the cell.",
+    "Qdrant stores vectors and payloads and supports filtered search.",
+    "Retrieval-augmented generation grounds answers in retrieved documents.",
+    "short",
+    "A much longer passage that keeps going to exercise padding and truncation " * 20,
+]
+
+
+def export(output_dir: str):
+    import torch
+
+    class TokenEmbeddings(torch.nn.Module):
+        """Feeds positional inputs as keyword arguments and returns only last_hidden_state"""
+
+        def __init__(self, model, input_names):
+            super().__init__()
+            self.model = model
+            self.input_names = input_names
+
+        def forward(self, *inputs):
+            return self.model(**dict(zip(self.input_names, inputs)))[0]
+
+    reference = TorchBackend(settings.EMBEDDING_MODEL)
+    transformer = reference.model[0]
+    pooling = reference.model[1]
+    pooling_config = pooling.get_config_dict()
+    if not (pooling_config.get("pooling_mode_mean_tokens") or pooling_config.get("pooling_mode") == "mean"):
+        raise SystemExit("only mean-pooling models are supported by the ONNX backend")
+
+    os.makedirs(output_dir, exist_ok=True)
+    model = transformer.auto_model.eval()
+    dummy = transformer.tokenizer(["export"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in dummy]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(model, input_names),
+            tuple(dummy[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            dynamo=False
+        )
+    print(f"exported {model_path}")
+
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    int8_path = os.path.join(output_dir, ONNX_INT8_MODEL_FILE)
+    quantize_dynamic(model_path, int8_path, weight_type=QuantType.QInt8)
+    print(f"quantized {int8_path}")
+
+    transformer.tokenizer.save_pretrained(output_dir)
+    with open(os.path.join(output_dir, ONNX_CONFIG_FILE), "w") as f:
+        json.dump({
+            "model": settings.EMBEDDING_MODEL,
+            "max_seq_length": reference.max_seq_length,
+            "dimension": reference.dimension,
+            "normalize": any(type(m).__name__ == "Normalize" for m in reference.model)
+        }, f, indent=2)
+    return reference
+
+
+def check(reference: TorchBackend, output_dir: str, sentences, min_cosine: float, min_cosine_int8: float) -> bool:
+    baseline = reference.encode(sentences)
+    ok = True
+    for quantized, threshold in ((False, min_cosine), (True, min_cosine_int8)):
+        backend = OnnxBackend(output_dir, quantized=quantized)
+        agreement = cosine_agreement(baseline, backend.encode(sentences))
+        passed = agreement.min() >= threshold
+        ok = ok and passed
+        print(f"{backend.name:10s} cosine vs torch: mean {agreement.mean():.5f}, min {agreement.min():.5f} "
+              f"(threshold {threshold}) {'OK' if passed else 'FAIL'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--output", default=settings.EMBEDDING_ONNX_DIR)
+    parser.add_argument("--sentences", help="text file with one sample sentence per line")
+    parser.add_argument("--min-cosine", type=float, default=0.999)
+    parser.add_argument("--min-cosine-int8", type=float, default=0.98)
+    args = parser.parse_args()
+
+    sentences = SAMPLE_SENTENCES
+    if args.sentences:
+        with open(args.sentences, encoding="utf-8") as f:
+            sentences = [line.strip() for line in f if line.strip()]
+
+    reference = export(args.output)
+    if not check(reference, args.output, sentences, args.min_cosine, args.min_cosine_int8):
+        raise SystemExit("ONNX export does not agree with the torch model")
+
+
+if __name__ == "__main__":
+    main()
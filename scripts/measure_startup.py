@@ -0,0 +1,58 @@
+"""
+Measure import time, model warm-up time and memory of the API process.
+
+    python -m scripts.measure_startup
+    python -m scripts.measure_startup --workers 4   # pss per forked worker with the model preloaded
+"""
+import argparse
+import os
+import time
+
+
+def _mib(value: int) -> str:
+    return f"{value / 2**20:.0f} MiB"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=0, help="fork this many children after preloading")
+    args = parser.parse_args()
+
+    from core.metrics import process_memory
+
+    start = time.perf_counter()
+    import main  # noqa: F401
+    print(f"import main: {time.perf_counter() - start:.2f}s, rss {_mib(process_memory().get('rss', 0))}")
+
+    from services.embeddings import preload_model, warm_up
+    start = time.perf_counter()
+    preload_model()
+    print(f"load model: {time.perf_counter() - start:.2f}s, rss {_mib(process_memory().get('rss', 0))}")
+
+    if args.workers:
+        children = []
+        for _ in range(args.workers):
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                warm_up()
+                memory = process_memory()
+                os.write(write_fd, f"{memory.get('rss', 0)} {memory.get('pss', 0)}".encode())
+                os._exit(0)
+            os.close(write_fd)
+            children.append((pid, read_fd))
+
+        total_pss = process_memory().get("pss", 0)
+        for pid, read_fd in children:
+            rss, pss = (int(v) for v in os.read(read_fd, 64).split())
+            os.waitpid(pid, 0)
+            total_pss += pss
+            print(f"worker {pid}: rss {_mib(rss)}, pss {_mib(pss)}")
+        print(f"total pss (master + {args.workers} workers): {_mib(total_pss)}")
+    else:
+        print(f"warm up: {warm_up():.2f}s, rss {_mib(process_memory().get('rss', 0))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Rebuild the Qdrant collection from sqlite chunks and the persisted embeddings, then switch the
+QDRANT_COLLECTION alias to it. Use it to change HNSW parameters or quantization without re-uploading files.
+
+    python -m scripts.rebuild_collection
+    python -m scripts.rebuild_collection --hnsw-m 32 --ef-construct 200 --quantization int8
+    python -m scripts.rebuild_collection --replace-collection   # first run, when QDRANT_COLLECTION is a real collection
+"""
+import argparse
+import json
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--hnsw-m", type=int, default=None)
+    parser.add_argument("--ef-construct", type=int, default=None)
+    parser.add_argument("--quantization", choices=["none", "int8"], default="none")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--parallel", type=int, default=4, help="upload processes")
+    parser.add_argument("--sample", type=int, default=50, help="queries for the recall check")
+    parser.add_argument("--min-recall", type=float, default=0.9)
+    parser.add_argument("--replace-collection", action="store_true")
+    parser.add_argument("--keep-previous", type=int, default=1, help="older collections kept for rollback")
+    args = parser.parse_args()
+
+    import main  # noqa: F401  (registers the models)
+    from services.collection_rebuild import rebuild_collection
+
+    report = rebuild_collection(
+        hnsw_m=args.hnsw_m,
+        ef_construct=args.ef_construct,
+        quantization=None if args.quantization == "none" else args.quantization,
+        batch_size=args.batch_size,
+        parallel=args.parallel,
+        sample_size=args.sample,
+        min_recall=args.min_recall,
+        replace_collection=args.replace_collection,
+        keep_previous=args.keep_previous
+    )
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""
+Drop chunk text from the payload of every existing Qdrant point.
+Run after setting QDRANT_STORE_TEXT=false; search then hydrates text from sqlite.
+
+    python -m scripts.slim_payloads
+"""
+from core.configuration import settings
+from services.vectorsStore import drop_payload_text
+
+
+def main():
+    if settings.QDRANT_STORE_TEXT:
+        print("QDRANT_STORE_TEXT is still true: new points would keep storing text, set it to false first")
+        return
+    drop_payload_text(settings.QDRANT_COLLECTION)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,207 @@
+from datetime import date, datetime, time, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import and_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from models.booking import Booking
+from core.configuration import settings
+from core.database import SessionLocal
+from core.pagination import keyset_page, iter_keyset
+
+
+class SlotUnavailableError(Exception):
+    """Every interviewer asked for is already booked at this slot"""
+
+    def __init__(self, slot_date: date, slot_time: time):
+        super().__init__(f"{slot_date.isoformat()} {slot_time.strftime('%H:%M')} is already booked")
+        self.slot_date = slot_date
+        self.slot_time = slot_time
+
+
+def interviewers() -> List[str]:
+    return list(settings.BOOKING_INTERVIEWERS) or [settings.DEFAULT_INTERVIEWER]
+
+
+def _candidates(interviewer_id: Optional[str]) -> List[str]:
+    """Interviewers to consider: the one asked for, which must be configured, else all of them"""
+    if not interviewer_id:
+        return interviewers()
+    if interviewer_id not in interviewers():
+        raise ValueError(f"unknown interviewer '{interviewer_id}'")
+    return [interviewer_id]
+
+
+def slot_times() -> List[time]:
+    """Start times of the daily slot grid"""
+    start = datetime.strptime(settings.BOOKING_DAY_START, "%H:%M")
+    end = datetime.strptime(settings.BOOKING_DAY_END, "%H:%M")
+    step = timedelta(minutes=settings.BOOKING_SLOT_MINUTES)
+    times = []
+    while start + step <= end:
+        times.append(start.time())
+        start += step
+    return times
+
+
+def is_on_grid(slot_date: date, slot_time: time) -> bool:
+    return slot_date.weekday() in settings.BOOKING_WEEKDAYS and slot_time.replace(second=0, microsecond=0) in slot_times()
+
 
 class BookingService:
     @staticmethod
-    def create_booking(db :Session,name:str, email:str, date:str, time:str) -> Booking:
-        booking = Booking(
-            name = name,
-            email = email,
-            booking_date = date,
-            booking_time = time
-        )
+    def create_booking(
+        db: Session, name: str, email: str, slot_date: date, slot_time: time, interviewer_id: Optional[str] = None
+    ) -> Booking:
+        """
+        Book a slot with an insert guarded by the unique slot index: no read-then-write window and no lock held,
+        two concurrent requests for the same slot cannot both succeed.
+        :param interviewer_id: interviewer to book; None books the first configured interviewer free at that slot
+        :raises ValueError: unknown interviewer, or the slot is in the past or not on the slot grid
+        :raises SlotUnavailableError: the slot is taken (for every candidate interviewer)
+        """
+        candidates = _candidates(interviewer_id)
+        slot_time = slot_time.replace(second=0, microsecond=0)
+        if not is_on_grid(slot_date, slot_time):
+            raise ValueError(
+                f"{slot_date.isoformat()} {slot_time.strftime('%H:%M')} is not a bookable slot "
+                f"({settings.BOOKING_DAY_START}-{settings.BOOKING_DAY_END} every {settings.BOOKING_SLOT_MINUTES} minutes)"
+            )
+        if datetime.combine(slot_date, slot_time) < datetime.now():
+            raise ValueError("slot is in the past")
+
+        for candidate in candidates:
+            booking = Booking(
+                name = name,
+                email = email,
+                booking_date = slot_date.isoformat(),
+                booking_time = slot_time.strftime("%H:%M"),
+                interviewer_id = candidate,
+                slot_date = slot_date,
+                slot_time = slot_time
+            )
+            db.add(booking)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                continue
+            db.refresh(booking)
+            return booking
+        raise SlotUnavailableError(slot_date, slot_time)
+
+    @staticmethod
+    def free_slots(
+        db: Session, date_from: date, date_to: date, interviewer_id: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        Open slots between two dates (inclusive), earliest first: the slot grid minus the bookings found
+        by one range scan of the unique slot index. Slots already past are left out.
+        :raises ValueError: unknown interviewer
+        """
+        candidates = _candidates(interviewer_id)
+        booked = {
+            (row.interviewer_id, row.slot_date, row.slot_time)
+            for row in db.query(Booking.interviewer_id, Booking.slot_date, Booking.slot_time).filter(
+                Booking.interviewer_id.in_(candidates),
+                and_(Booking.slot_date >= date_from, Booking.slot_date <= date_to)
+            )
+        }
 
-        db.add(booking)
-        db.commit()
-        db.refresh(booking)
+        now = datetime.now()
+        times = slot_times()
+        slots = []
+        day = date_from
+        while day <= date_to:
+            if day.weekday() in settings.BOOKING_WEEKDAYS:
+                for slot_time in times:
+                    if datetime.combine(day, slot_time) < now:
+                        continue
+                    for candidate in candidates:
+                        if (candidate, day, slot_time) not in booked:
+                            slots.append({"interviewer_id": candidate, "slot_date": day, "slot_time": slot_time})
+                            if limit and len(slots) >= limit:
+                                return slots
+            day += timedelta(days=1)
+        return slots
 
-        return booking
+    @staticmethod
+    def backfill_slots(batch_size: int = 500) -> int:
+        """
+        Fill the typed slot columns of bookings stored before they existed, parsed from the text columns.
+        Rows that do not parse, or that would double-book a slot, are assigned to DEFAULT_INTERVIEWER without a slot.
+        :return: number of bookings backfilled
+        """
+        db = SessionLocal()
+        filled = 0
+        try:
+            last_id = 0
+            while True:
+                rows = db.query(Booking).filter(
+                    Booking.interviewer_id.is_(None), Booking.id > last_id
+                ).order_by(Booking.id).limit(batch_size).all()
+                if not rows:
+                    break
+                for booking in rows:
+                    booking.interviewer_id = settings.DEFAULT_INTERVIEWER
+                    try:
+                        slot_date = datetime.strptime(booking.booking_date.strip(), "%Y-%m-%d").date()
+                        slot_time = datetime.strptime(booking.booking_time.strip()[:5], "%H:%M").time()
+                    except ValueError:
+                        continue
+                    taken = db.query(Booking.id).filter(
+                        Booking.interviewer_id == settings.DEFAULT_INTERVIEWER,
+                        Booking.slot_date == slot_date,
+                        Booking.slot_time == slot_time
+                    ).first()
+                    if taken is None:
+                        booking.slot_date = slot_date
+                        booking.slot_time = slot_time
+                        # flushed one by one so the next row's lookup sees this slot
+                        db.flush()
+                        filled += 1
+                last_id = rows[-1].id
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # another worker is backfilling the same rows
+                    db.rollback()
+                    break
+        finally:
+            db.close()
+        if filled:
+            print(f"backfilled slots of {filled} bookings")
+        return filled
+
+    @staticmethod
+    def _filtered(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None, email: Optional[str] = None):
+        query = db.query(Booking)
+        if email:
+            query = query.filter(Booking.email == email)
+        if date_from:
+            query = query.filter(Booking.created_at >= datetime.combine(date_from, time.min))
+        if date_to:
+            query = query.filter(Booking.created_at <= datetime.combine(date_to, time.max))
+        return query
+
+    @staticmethod
+    def get_all_bookings(
+        db: Session, limit: int = 50, cursor: Optional[str] = None,
+        date_from: Optional[date] = None, date_to: Optional[date] = None
+    ) -> Tuple[List[Booking], Optional[str]]:
+        """One page of bookings, newest first; pass the returned cursor to get the next page"""
+        query = BookingService._filtered(db, date_from, date_to)
+        return keyset_page(query, Booking.created_at, Booking.id, cursor, limit)
 
     @staticmethod
-    def get_all_bookings(db:Session):
-        return db.query(Booking).order_by(Booking.created_at.desc()).all()
+    def iter_bookings(db: Session, date_from: Optional[date] = None, date_to: Optional[date] = None, email: Optional[str] = None):
+        """Every matching booking, newest first, fetched in keyset batches (for exports)"""
+        query = BookingService._filtered(db, date_from, date_to, email)
+        return iter_keyset(query, Booking.created_at, Booking.id)
 
     @staticmethod
-    def get_booking_by_email(db:Session, email: str):
-        return db.query(Booking).filter(email == Booking.email).all()
\ No newline at end of file
+    def get_booking_by_email(
+        db: Session, email: str, limit: int = 50, cursor: Optional[str] = None
+    ) -> Tuple[List[Booking], Optional[str]]:
+        query = BookingService._filtered(db, email=email)
+        return keyset_page(query, Booking.created_at, Booking.id, cursor, limit)
@@ -1,62 +1,199 @@
-from typing import List, Dict
+from typing import List, Dict, Iterator, Optional, Tuple
 import re
+import zlib
 
-def chunk_by_sentence(text: str, chunk_size: int = 500, overlap: int = 50) -> List[Dict]:
-    sentences = re.split(r'(?<=[.!?])\s+', text.strip())
-    chunks = []
-    current_chunk = ""
-
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-            chunks.append({
-                "text": current_chunk.strip(),
-                "chunk_index": len(chunks),
-                "strategy": "sentence",
-                "char_count": len(current_chunk.strip())
-            })
-            # keep overlap
-            words = current_chunk.split()
-            overlap_text = " ".join(words[-overlap//5:]) if len(words) > 5 else ""
-            current_chunk = (overlap_text + " " + sentence).strip() if overlap_text else sentence
-        else:
-            current_chunk += (" " if current_chunk else "") + sentence
-
-    if current_chunk.strip():
-        chunks.append({
-            "text": current_chunk.strip(),
-            "chunk_index": len(chunks),
-            "strategy": "sentence",
-            "char_count": len(current_chunk.strip())
-        })
-    return chunks
+# (start, end) character offsets into the source text
+Span = Tuple[int, int]
 
+_SENTENCE_BREAK = re.compile(r'(?<=[.!?])\s+')
+_WHITESPACE = re.compile(r'\s*')
 
-def chunk_by_fixed_size(text: str, chunk_size: int = 500, overlap: int = 100) -> List[Dict]:
-    text = text.strip()
-    chunks = []
+
+def _trim(text: str, start: int, end: int) -> Span:
+    """Shrink a span so it neither starts nor ends with whitespace"""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def _next_word_start(text: str, pos: int, limit: int) -> int:
+    """First word start at or after pos (skips the rest of a word pos falls inside)"""
+    if pos > 0 and not text[pos - 1].isspace():
+        while pos < limit and not text[pos].isspace():
+            pos += 1
+    while pos < limit and text[pos].isspace():
+        pos += 1
+    return pos
+
+
+def _iter_sentences(text: str) -> Iterator[Span]:
     start = 0
+    for match in _SENTENCE_BREAK.finditer(text):
+        span = _trim(text, start, match.start())
+        if span[1] > span[0]:
+            yield span
+        start = match.end()
+    span = _trim(text, start, len(text))
+    if span[1] > span[0]:
+        yield span
 
-    while start < len(text):
-        end = start + chunk_size
-        chunk_text = text[start:end]
-        chunks.append({
-            "text": chunk_text.strip(),
-            "chunk_index": len(chunks),
-            "strategy": "fixed",
-            "char_count": len(chunk_text.strip())
-        })
-        start += chunk_size - overlap
 
-    return chunks
+def _is_cut_point(text: str, start: int, end: int, chunk_size: int) -> bool:
+    """
+    Content-defined boundary after the sentence text[start:end]: a paragraph break, or a sentence whose
+    checksum (of its last 32 characters) falls under its share of chunk_size, about one cut per chunk_size characters.
+    The decision depends only on the sentence itself, so an edit moves boundaries up to the next cut point only.
+    """
+    if text.count("\n", end, _WHITESPACE.match(text, end).end()) >= 2:
+        return True
+    return zlib.crc32(text[max(start, end - 32):end].encode("utf-8")) % chunk_size < end - start
 
 
-def chunk_text(text: str, strategy: str = "sentence", chunk_size: int = 500, overlap: int = 100) -> List[Dict]:
-    if not text or not text.strip():
-        return []
+def _overlap_start(text: str, chunk_start: int, chunk_end: int, overlap: int) -> Optional[int]:
+    """Start of the tail of a chunk that is repeated at the head of the next one, cut at a word boundary"""
+    if overlap <= 0:
+        return None
+    pos = _next_word_start(text, max(chunk_start, chunk_end - overlap), chunk_end)
+    return pos if chunk_start < pos < chunk_end else None
+
+
+def iter_sentence_spans(text: str, chunk_size: int = 500, overlap: int = 50) -> Iterator[Span]:
+    """
+    Pack whole sentences into chunks of at most chunk_size characters, in one pass.
+    Chunks end at content-defined cut points (see _is_cut_point) once they hold chunk_size // 4 characters,
+    or when the next sentence would not fit, so re-chunking an edited text reproduces the chunks away from the edit.
+    Consecutive chunks share up to `overlap` characters, cut at a word boundary.
+    A single sentence longer than chunk_size becomes its own chunk.
+    """
+    min_size = chunk_size // 4
+    chunk_start = chunk_end = carry = None
+    for start, end in _iter_sentences(text):
+        if chunk_start is not None and end - chunk_start > chunk_size:
+            yield chunk_start, chunk_end
+            carry = _overlap_start(text, chunk_start, chunk_end, overlap)
+            chunk_start = None
+        if chunk_start is None:
+            chunk_start = carry if carry is not None else start
+            carry = None
+        chunk_end = end
+        if end - chunk_start >= min_size and _is_cut_point(text, start, end, chunk_size):
+            yield chunk_start, chunk_end
+            carry = _overlap_start(text, chunk_start, chunk_end, overlap)
+            chunk_start = None
+
+    if chunk_start is not None:
+        yield chunk_start, chunk_end
+
 
+def iter_fixed_spans(text: str, chunk_size: int = 500, overlap: int = 100) -> Iterator[Span]:
+    """
+    Windows of at most chunk_size characters advancing by chunk_size - overlap.
+    Window edges are moved to whitespace so words are not cut in half
+    (a window with no whitespace at all is cut hard).
+    """
+    length = len(text)
+    start, _ = _trim(text, 0, length)
+    while start < length:
+        end = min(start + chunk_size, length)
+        if end < length and not text[end].isspace():
+            cut = end
+            while cut > start and not text[cut - 1].isspace():
+                cut -= 1
+            if cut > start:
+                end = cut
+
+        span = _trim(text, start, end)
+        if span[1] > span[0]:
+            yield span
+        if end >= length:
+            break
+
+        if not text[end - 1].isspace() and not text[end].isspace():
+            # cut inside an unbroken run: overlap it hard as well, skipping the rest of the run would drop text
+            start = max(end - overlap, start + 1)
+            continue
+        next_start = _next_word_start(text, max(end - overlap, start + 1), end)
+        start = next_start if next_start < end else _next_word_start(text, end, length)
+
+
+def iter_token_spans(text: str, max_tokens: int, overlap_tokens: int = 32, tokenizer=None) -> Iterator[Span]:
+    """
+    Windows sized in embedding-model tokens so no chunk is truncated by the encoder.
+    The text is tokenized once; offsets of the tokens give the character spans.
+    :param max_tokens: model token budget per chunk, including special tokens
+    """
+    if tokenizer is None:
+        from services.embeddings import get_tokenizer
+        tokenizer = get_tokenizer()
+
+    offsets = tokenizer(
+        text,
+        add_special_tokens=False,
+        return_offsets_mapping=True,
+        truncation=False,
+        verbose=False
+    )["offset_mapping"]
+    budget = max(1, max_tokens - tokenizer.num_special_tokens_to_add())
+    overlap_tokens = min(overlap_tokens, budget - 1)
+
+    def continues_word(i: int) -> bool:
+        # sub-word pieces of one word have touching offsets
+        return offsets[i][0] == offsets[i - 1][1]
+
+    count = len(offsets)
+    i = 0
+    while i < count:
+        j = min(i + budget, count)
+        if j < count:
+            cut = j
+            while cut > i + 1 and continues_word(cut):
+                cut -= 1
+            if cut > i + 1:
+                j = cut
+
+        yield offsets[i][0], offsets[j - 1][1]
+        if j >= count:
+            break
+
+        next_i = max(j - overlap_tokens, i + 1)
+        while next_i < j and continues_word(next_i):
+            next_i += 1
+        i = next_i
+
+
+def chunk_spans(text: str, strategy: str = "sentence", chunk_size: int = 500, overlap: int = 100) -> List[Span]:
+    """Chunk boundaries only, without copying any text"""
     if strategy == "sentence":
-        return chunk_by_sentence(text, chunk_size, overlap)
+        return list(iter_sentence_spans(text, chunk_size, overlap))
     elif strategy == "fixed":
-        return chunk_by_fixed_size(text, chunk_size, overlap)
+        return list(iter_fixed_spans(text, chunk_size, overlap))
+    elif strategy == "token":
+        from services.embeddings import get_encoder
+        max_tokens = min(chunk_size, get_encoder().max_seq_length)
+        return list(iter_token_spans(text, max_tokens, overlap))
     else:
-        raise ValueError(f"Unknown strategy: {strategy}. Use 'sentence' or 'fixed'.")
+        raise ValueError(f"Unknown strategy: {strategy}. Use 'sentence', 'fixed' or 'token'.")
+
+
+def chunk_text(text: str, strategy: str = "sentence", chunk_size: int = 500, overlap: int = 100) -> List[Dict]:
+    """
+    Chunk text and materialize each chunk once.
+    For the 'token' strategy chunk_size and overlap are in model tokens (chunk_size is capped at the
+    model's max sequence length), otherwise in characters.
+    """
+    if not text or not text.strip():
+        return []
+
+    chunks = []
+    for start, end in chunk_spans(text, strategy, chunk_size, overlap):
+        chunks.append({
+            "text": text[start:end],
+            "chunk_index": len(chunks),
+            "strategy": strategy,
+            "char_count": end - start,
+            "start": start,
+            "end": end
+        })
+    return chunks
@@ -0,0 +1,292 @@
+import hashlib
+import random
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Set
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, HnswConfigDiff, OptimizersConfigDiff,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, SearchRequest,
+    Filter, FieldCondition, MatchValue, MatchAny, FilterSelector,
+    CreateAlias, CreateAliasOperation, DeleteAlias, DeleteAliasOperation
+)
+
+from core.configuration import settings
+from core.database import SessionLocal
+from models.metadata import DocMetaData, ChunkMetadata
+from services.documentService import DocumentService
+from services.embedding_store import load_document_embeddings, save_document_embeddings
+from services.embeddings import generate_embeddings
+from services.vectorsStore import get_qdrant_client, ensure_payload_indexes, chunk_payload, chunk_point_id
+
+# qdrant's default; indexing is switched off while the new collection is bulk loaded
+INDEXING_THRESHOLD = 20000
+
+
+class RebuildValidationError(Exception):
+    """The new collection did not match the source data; the alias was left untouched"""
+
+
+def _alias_target(client: QdrantClient, alias: str) -> Optional[str]:
+    for a in client.get_aliases().aliases:
+        if a.alias_name == alias:
+            return a.collection_name
+    return None
+
+
+def _document_points(db, doc: DocMetaData, stats: Dict) -> List[PointStruct]:
+    """Points of one document built from its chunk rows and persisted vectors; missing vectors are re-embedded"""
+    rows = db.query(ChunkMetadata).filter(
+        ChunkMetadata.document_id == doc.document_id
+    ).order_by(ChunkMetadata.chunk_index).all()
+    if not rows:
+        return []
+
+    chunks = [
+        {
+            "chunk_id": row.chunk_id,
+            "chunk_index": row.chunk_index,
+            "text": row.text,
+            "char_count": row.char_count,
+            "strategy": doc.chunking_strategy,
+            # chunks stored before content hashes get one here so their vectors can be persisted too
+            "content_hash": row.content_hash or hashlib.sha256(row.text.encode("utf-8")).hexdigest()
+        }
+        for row in rows
+    ]
+    stored = load_document_embeddings(doc.document_id)
+    missing = [chunk for chunk in chunks if chunk["content_hash"] not in stored]
+    if missing:
+        embeddings = generate_embeddings(missing, bulk=True)
+        save_document_embeddings(
+            doc.document_id, missing, embeddings, keep_hashes=[chunk["content_hash"] for chunk in chunks]
+        )
+        stored.update({chunk["content_hash"]: vector for chunk, vector in zip(missing, embeddings)})
+        stats["re_embedded"] += len(missing)
+    stats["reused"] += len(chunks) - len(missing)
+
+    upload_ts = (doc.upload_time or datetime.now()).timestamp()
+    return [
+        PointStruct(
+            id=chunk_point_id(chunk["chunk_id"]),
+            vector=np.asarray(stored[chunk["content_hash"]], dtype=np.float32).tolist(),
+            payload=chunk_payload(chunk, doc.document_id, doc.file_type, upload_ts, doc.tenant_id)
+        )
+        for chunk in chunks
+    ]
+
+
+def _iter_points(document_ids: Set[str], samples: List[List[float]], sample_size: int, stats: Dict) -> Iterator[PointStruct]:
+    """Every point of every document, streamed; reservoir-samples vectors to use as recall queries"""
+    db = SessionLocal()
+    try:
+        seen = 0
+        for doc in DocumentService.iter_documents(db):
+            document_ids.add(doc.document_id)
+            for point in _document_points(db, doc, stats):
+                seen += 1
+                if len(samples) < sample_size:
+                    samples.append(point.vector)
+                elif random.random() < sample_size / seen:
+                    samples[random.randrange(sample_size)] = point.vector
+                yield point
+    finally:
+        db.close()
+
+
+def _wait_until_indexed(client: QdrantClient, collection_name: str, timeout: float = 3600):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if "green" in str(client.get_collection(collection_name).status).lower():
+            return
+        time.sleep(2)
+    raise RebuildValidationError(f"collection '{collection_name}' still optimizing after {timeout}s")
+
+
+def sample_recall(client: QdrantClient, reference: str, candidate: str, queries: List[List[float]], top_k: int = 10) -> float:
+    """Share of the reference collection's top-k hits (by document and chunk position) also returned by the candidate"""
+    if not queries:
+        return 1.0
+
+    def top_hits(collection_name: str):
+        requests = [
+            SearchRequest(vector=query, limit=top_k, with_payload=["document_id", "chunk_index"])
+            for query in queries
+        ]
+        return [
+            {(hit.payload["document_id"], hit.payload["chunk_index"]) for hit in hits}
+            for hits in client.search_batch(collection_name=collection_name, requests=requests)
+        ]
+
+    found = total = 0
+    for expected, actual in zip(top_hits(reference), top_hits(candidate)):
+        found += len(expected & actual)
+        total += len(expected)
+    return found / total if total else 1.0
+
+
+def _catch_up(client: QdrantClient, collection_name: str, since: datetime, copied: Set[str], stats: Dict):
+    """
+    Apply writes that reached the old collection while the new one was being built:
+    copy documents uploaded or re-ingested since the rebuild started and drop documents deleted meanwhile.
+    """
+    db = SessionLocal()
+    try:
+        changed = db.query(DocMetaData).filter(
+            (DocMetaData.upload_time >= since) | (DocMetaData.updated_time >= since)
+        ).all()
+        for doc in changed:
+            points = _document_points(db, doc, stats)
+            if not points:
+                continue
+            client.upsert(collection_name=collection_name, points=points)
+            # points of chunks removed by a re-ingest
+            client.delete(
+                collection_name=collection_name,
+                points_selector=FilterSelector(filter=Filter(
+                    must=[FieldCondition(key="document_id", match=MatchValue(value=doc.document_id))],
+                    must_not=[FieldCondition(key="chunk_id", match=MatchAny(any=[p.payload["chunk_id"] for p in points]))]
+                ))
+            )
+
+        remaining = {
+            row.document_id
+            for row in db.query(DocMetaData.document_id).filter(DocMetaData.document_id.in_(copied))
+        } if copied else set()
+    finally:
+        db.close()
+
+    deleted = list(copied - remaining)
+    if deleted:
+        client.delete(
+            collection_name=collection_name,
+            points_selector=FilterSelector(filter=Filter(must=[
+                FieldCondition(key="document_id", match=MatchAny(any=deleted))
+            ]))
+        )
+    stats["caught_up_documents"] = len(changed)
+    stats["caught_up_deletions"] = len(deleted)
+
+
+def rebuild_collection(
+    alias: Optional[str] = None,
+    hnsw_m: Optional[int] = None,
+    ef_construct: Optional[int] = None,
+    quantization: Optional[str] = None,
+    batch_size: int = 256,
+    parallel: int = 4,
+    sample_size: int = 50,
+    min_recall: float = 0.9,
+    replace_collection: bool = False,
+    keep_previous: int = 1
+) -> Dict:
+    """
+    Build a new versioned collection from sqlite chunks and persisted vectors, validate it,
+    then atomically point the alias (QDRANT_COLLECTION) at it. Searches keep hitting the old
+    collection until the switch, so there is no downtime.
+    :param hnsw_m: HNSW graph degree of the new collection (qdrant default if None)
+    :param ef_construct: HNSW build-time search width (qdrant default if None)
+    :param quantization: None or "int8" (scalar quantization)
+    :param parallel: upload processes
+    :param sample_size: number of stored vectors used as queries for the recall check
+    :param min_recall: minimum recall@10 of the new collection against the current one
+    :param replace_collection: allow replacing a real collection named like the alias (first rebuild only);
+                               the old collection is dropped just before the alias is created, a gap of one call
+    :param keep_previous: older versioned collections kept for rollback
+    """
+    if settings.QDRANT_TENANT_LAYOUT == "collection" or settings.QDRANT_TENANT_ROUTES or settings.QDRANT_USE_SHARD_KEYS:
+        raise RebuildValidationError(
+            "rebuild only supports one collection on the default endpoint (no per-tenant collections, routes or shard keys)"
+        )
+    alias = alias or settings.QDRANT_COLLECTION
+    client = get_qdrant_client()
+    started = datetime.now()
+    new_collection = f"{alias}_v{started.strftime('%Y%m%d%H%M%S%f')}"
+
+    existing = [c.name for c in client.get_collections().collections]
+    current = _alias_target(client, alias)
+    is_real_collection = alias in existing
+    if is_real_collection and not replace_collection:
+        raise RebuildValidationError(
+            f"'{alias}' is a collection, not an alias; rerun with replace_collection to migrate it "
+            f"(queries fail for the duration of one call while it is swapped for an alias)"
+        )
+    reference = current or (alias if is_real_collection else None)
+
+    print(f"building collection '{new_collection}'")
+    client.create_collection(
+        collection_name=new_collection,
+        vectors_config=VectorParams(size=settings.EMBEDDING_DIMENSION, distance=Distance.COSINE),
+        hnsw_config=HnswConfigDiff(m=hnsw_m, ef_construct=ef_construct) if hnsw_m or ef_construct else None,
+        quantization_config=ScalarQuantization(
+            scalar=ScalarQuantizationConfig(type=ScalarType.INT8, always_ram=True)
+        ) if quantization == "int8" else None,
+        # build the HNSW graph once after the bulk load instead of incrementally
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=0)
+    )
+    ensure_payload_indexes(client, new_collection)
+
+    stats = {"reused": 0, "re_embedded": 0}
+    copied: Set[str] = set()
+    samples: List[List[float]] = []
+    try:
+        start = time.perf_counter()
+        client.upload_points(
+            collection_name=new_collection,
+            points=_iter_points(copied, samples, sample_size, stats),
+            batch_size=batch_size,
+            parallel=parallel,
+            wait=True
+        )
+        expected = stats["reused"] + stats["re_embedded"]
+        print(f"uploaded {expected} points in {time.perf_counter() - start:.1f}s "
+              f"({stats['reused']} persisted vectors, {stats['re_embedded']} re-embedded)")
+
+        client.update_collection(
+            collection_name=new_collection,
+            optimizers_config=OptimizersConfigDiff(indexing_threshold=INDEXING_THRESHOLD)
+        )
+        _wait_until_indexed(client, new_collection)
+
+        count = client.count(new_collection, exact=True).count
+        if count != expected:
+            raise RebuildValidationError(f"'{new_collection}' has {count} points, expected {expected}")
+        recall = sample_recall(client, reference, new_collection, samples) if reference else 1.0
+        print(f"recall@10 against '{reference}': {recall:.3f}")
+        if recall < min_recall:
+            raise RebuildValidationError(f"recall {recall:.3f} below {min_recall}")
+    except Exception:
+        client.delete_collection(new_collection)
+        raise
+
+    if is_real_collection:
+        print(f"replacing collection '{alias}' with an alias")
+        client.delete_collection(alias)
+        operations = []
+    else:
+        operations = [DeleteAliasOperation(delete_alias=DeleteAlias(alias_name=alias))] if current else []
+    operations.append(CreateAliasOperation(create_alias=CreateAlias(collection_name=new_collection, alias_name=alias)))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    print(f"alias '{alias}' -> '{new_collection}'")
+
+    _catch_up(client, new_collection, started, copied, stats)
+
+    versions = sorted(
+        c.name for c in client.get_collections().collections
+        if c.name.startswith(f"{alias}_v") and c.name != new_collection
+    )
+    dropped = versions[:max(0, len(versions) - keep_previous)]
+    for name in dropped:
+        client.delete_collection(name)
+
+    return {
+        "alias": alias,
+        "collection": new_collection,
+        "previous": current,
+        "points": count,
+        "recall": round(recall, 4),
+        "dropped_collections": dropped,
+        **stats
+    }
@@ -1,11 +1,19 @@
+from sqlalchemy import update, bindparam
 from sqlalchemy.orm import Session
 from models.metadata import DocMetaData, ChunkMetadata
-from typing import List, Dict
+from core.pagination import keyset_page, iter_keyset, encode_position_cursor, decode_position_cursor
+from typing import List, Dict, Tuple, Optional
+from datetime import datetime
+import hashlib
 import uuid
 import io
 import PyPDF2
 
 
+# ids per IN list when looking chunks up in bulk, well under SQLite's bound-parameter limit
+CHUNK_LOOKUP_BATCH = 500
+
+
 class DocumentService:
     @staticmethod
     def extract_text_from_pdf(file_bytes: bytes) -> str:
@@ -36,7 +44,8 @@ class DocumentService:
 
     @staticmethod
     def save_document_metadata(
-        db: Session, file_name: str, file_type: str, chunk_count: int, strategy: str, chunk_size: int
+        db: Session, file_name: str, file_type: str, chunk_count: int, strategy: str, chunk_size: int,
+        tenant_id: Optional[str] = None, expires_at: Optional[datetime] = None
     ) -> str:
         doc_id = str(uuid.uuid4())[:12]
         doc = DocMetaData(
@@ -45,30 +54,186 @@ class DocumentService:
             file_type=file_type,
             chunk_count=chunk_count,
             chunking_strategy=strategy,
-            chunk_size=chunk_size
+            chunk_size=chunk_size,
+            tenant_id=tenant_id,
+            expires_at=expires_at
         )
         db.add(doc)
         db.commit()
         db.refresh(doc)
         return doc_id
 
+    @staticmethod
+    def assign_chunk_ids(document_id: str, chunks: List[Dict]) -> List[Dict]:
+        """
+        Give every chunk a content hash and a chunk_id derived from it.
+        The id only depends on the document, the text and how many identical chunks precede it,
+        so an unchanged chunk keeps its id (and its Qdrant point) across re-ingestion.
+        """
+        seen: Dict[str, int] = {}
+        for chunk in chunks:
+            content_hash = hashlib.sha256(chunk["text"].encode("utf-8")).hexdigest()
+            occurrence = seen.get(content_hash, 0)
+            seen[content_hash] = occurrence + 1
+            chunk["content_hash"] = content_hash
+            chunk["chunk_id"] = f"{document_id}_{content_hash[:16]}_{occurrence}"
+        return chunks
+
+    @staticmethod
+    def _chunk_row(document_id: str, chunk: Dict) -> ChunkMetadata:
+        return ChunkMetadata(
+            chunk_id=chunk["chunk_id"],
+            document_id=document_id,
+            chunk_index=chunk["chunk_index"],
+            text=chunk["text"],
+            char_count=chunk["char_count"],
+            content_hash=chunk["content_hash"]
+        )
+
     @staticmethod
     def save_chunk_metadata(db: Session, document_id: str, chunks: List[Dict]):
-        for i, chunk in enumerate(chunks):
-            db.add(
-                ChunkMetadata(
-                    chunk_id=f"{document_id}_chunk_{i}",
-                    document_id=document_id,
-                    chunk_index=i,
-                    text=chunk["text"],
-                    char_count=chunk["char_count"]
-                )
-            )
+        """Store chunk rows; ids must be assigned (assign_chunk_ids) so sqlite and qdrant agree on them"""
+        if any("chunk_id" not in chunk for chunk in chunks):
+            raise ValueError("chunk ids must be assigned before saving chunks")
+        db.add_all([DocumentService._chunk_row(document_id, chunk) for chunk in chunks])
         db.commit()
 
     @staticmethod
-    def get_all_documents(db: Session):
-        return db.query(DocMetaData).order_by(DocMetaData.upload_time.desc()).all()
+    def diff_chunks(db: Session, document_id: str, chunks: List[Dict]) -> Tuple[List[Dict], List[Dict], List[str], bool]:
+        """
+        Compare a new chunk set (with ids assigned) against the stored chunks of a document.
+        :return: (added chunks, kept chunks whose index moved, removed chunk ids, legacy)
+                 legacy is True when stored chunks predate content hashes and can't be diffed
+        """
+        stored = {
+            row.chunk_id: row
+            for row in db.query(
+                ChunkMetadata.chunk_id, ChunkMetadata.chunk_index, ChunkMetadata.content_hash
+            ).filter(ChunkMetadata.document_id == document_id)
+        }
+        if any(row.content_hash is None for row in stored.values()):
+            return chunks, [], list(stored), True
+
+        added, moved = [], []
+        for chunk in chunks:
+            row = stored.get(chunk["chunk_id"])
+            if row is None:
+                added.append(chunk)
+            elif row.chunk_index != chunk["chunk_index"]:
+                moved.append(chunk)
+
+        new_ids = {chunk["chunk_id"] for chunk in chunks}
+        removed = [chunk_id for chunk_id in stored if chunk_id not in new_ids]
+        return added, moved, removed, False
+
+    @staticmethod
+    def apply_chunk_diff(
+        db: Session, doc: DocMetaData, added: List[Dict], moved: List[Dict], removed: List[str],
+        chunk_count: int, file_name: str, file_type: str, strategy: str, chunk_size: int
+    ):
+        """Write a re-ingestion diff and bump the document version in one transaction"""
+        try:
+            if removed:
+                db.query(ChunkMetadata).filter(
+                    ChunkMetadata.document_id == doc.document_id,
+                    ChunkMetadata.chunk_id.in_(removed)
+                ).delete(synchronize_session=False)
+            if moved:
+                chunks_table = ChunkMetadata.__table__
+                db.execute(
+                    update(chunks_table)
+                    .where(chunks_table.c.chunk_id == bindparam("moved_chunk_id"))
+                    .values(chunk_index=bindparam("new_index")),
+                    [{"moved_chunk_id": c["chunk_id"], "new_index": c["chunk_index"]} for c in moved]
+                )
+            db.add_all([DocumentService._chunk_row(doc.document_id, chunk) for chunk in added])
+
+            doc.file_name = file_name
+            doc.file_type = file_type
+            doc.chunk_count = chunk_count
+            doc.chunking_strategy = strategy
+            doc.chunk_size = chunk_size
+            doc.version = (doc.version or 1) + 1
+            doc.updated_time = datetime.now()
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+    @staticmethod
+    def _filtered_documents(db: Session, uploaded_after: Optional[datetime] = None, uploaded_before: Optional[datetime] = None):
+        query = db.query(DocMetaData)
+        if uploaded_after:
+            query = query.filter(DocMetaData.upload_time >= uploaded_after)
+        if uploaded_before:
+            query = query.filter(DocMetaData.upload_time <= uploaded_before)
+        return query
+
+    @staticmethod
+    def get_all_documents(
+        db: Session, limit: int = 50, cursor: Optional[str] = None,
+        uploaded_after: Optional[datetime] = None, uploaded_before: Optional[datetime] = None
+    ) -> Tuple[List[DocMetaData], Optional[str]]:
+        """One page of documents, newest upload first; pass the returned cursor to get the next page"""
+        query = DocumentService._filtered_documents(db, uploaded_after, uploaded_before)
+        return keyset_page(query, DocMetaData.upload_time, DocMetaData.id, cursor, limit)
+
+    @staticmethod
+    def iter_documents(db: Session, uploaded_after: Optional[datetime] = None, uploaded_before: Optional[datetime] = None):
+        """Every matching document, newest first, fetched in keyset batches (for exports)"""
+        query = DocumentService._filtered_documents(db, uploaded_after, uploaded_before)
+        return iter_keyset(query, DocMetaData.upload_time, DocMetaData.id)
+
+    @staticmethod
+    def get_chunk_texts(
+        db: Session, chunk_ids: List[str], positions: List[Tuple[str, int]] = ()
+    ) -> Tuple[Dict[str, str], Dict[Tuple[str, int], str]]:
+        """
+        Text of many chunks, in one query per CHUNK_LOOKUP_BATCH ids and per document for positions.
+        :param chunk_ids: chunks looked up by chunk id
+        :param positions: (document_id, chunk_index) of chunks whose id is unknown (points stored before chunk ids)
+        :return: text by chunk id and text by position
+        """
+        by_id: Dict[str, str] = {}
+        by_position: Dict[Tuple[str, int], str] = {}
+        columns = (ChunkMetadata.chunk_id, ChunkMetadata.document_id, ChunkMetadata.chunk_index, ChunkMetadata.text)
+
+        def collect(rows):
+            for row in rows:
+                by_id[row.chunk_id] = row.text
+                by_position[(row.document_id, row.chunk_index)] = row.text
+
+        # bounded IN lists instead of one OR term per chunk, which can pass SQLite's expression depth limit
+        chunk_ids = list(dict.fromkeys(chunk_ids))
+        for start in range(0, len(chunk_ids), CHUNK_LOOKUP_BATCH):
+            collect(db.query(*columns).filter(ChunkMetadata.chunk_id.in_(chunk_ids[start:start + CHUNK_LOOKUP_BATCH])))
+
+        indexes_by_document: Dict[str, List[int]] = {}
+        for document_id, chunk_index in positions:
+            indexes_by_document.setdefault(document_id, []).append(chunk_index)
+        for document_id, indexes in indexes_by_document.items():
+            indexes = sorted(set(indexes))
+            for start in range(0, len(indexes), CHUNK_LOOKUP_BATCH):
+                collect(db.query(*columns).filter(
+                    ChunkMetadata.document_id == document_id,
+                    ChunkMetadata.chunk_index.in_(indexes[start:start + CHUNK_LOOKUP_BATCH])
+                ))
+        return by_id, by_position
+
+    @staticmethod
+    def get_chunks(
+        db: Session, document_id: str, limit: int = 100, cursor: Optional[str] = None
+    ) -> Tuple[List[ChunkMetadata], Optional[str]]:
+        """One page of a document's chunks in document order, seeking on chunk_index"""
+        query = db.query(ChunkMetadata).filter(ChunkMetadata.document_id == document_id)
+        if cursor:
+            query = query.filter(ChunkMetadata.chunk_index > decode_position_cursor(cursor))
+
+        rows = query.order_by(ChunkMetadata.chunk_index).limit(limit + 1).all()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_position_cursor(rows[-1].chunk_index)
 
     @staticmethod
     def get_document_by_id(db: Session, doc_id: str):
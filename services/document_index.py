@@ -0,0 +1,56 @@
+from typing import Dict, Optional
+
+import numpy as np
+
+from core.configuration import settings
+from core.database import SessionLocal
+from models.metadata import DocMetaData
+from services.documentService import DocumentService
+from services.embedding_store import load_document_embeddings
+from services.vectorsStore import store_document_vector, document_chunk_vectors
+
+
+def document_vectors(doc: DocMetaData) -> np.ndarray:
+    """Chunk vectors of a stored document: the persisted float16 copies, else the vectors of its qdrant points"""
+    stored = load_document_embeddings(doc.document_id)
+    if stored and len(stored) >= (doc.chunk_count or 0):
+        return np.asarray(list(stored.values()), dtype=np.float32)
+    return document_chunk_vectors(doc.document_id, collection_name=settings.QDRANT_COLLECTION, tenant_id=doc.tenant_id)
+
+
+def index_document(doc: DocMetaData, embeddings: Optional[np.ndarray] = None) -> bool:
+    """
+    Write a document's centroid to the document index.
+    :param embeddings: every chunk embedding of the document when the caller has them (ingestion), else they are loaded
+    :return: False if the document has no vectors to index
+    """
+    if not settings.DOCUMENT_INDEX_ENABLED:
+        return False
+    vectors = embeddings if embeddings is not None else document_vectors(doc)
+    if not len(vectors):
+        return False
+    store_document_vector(
+        doc.document_id, vectors,
+        collection_name=settings.QDRANT_COLLECTION,
+        file_type=doc.file_type,
+        strategy=doc.chunking_strategy,
+        upload_time=doc.upload_time,
+        tenant_id=doc.tenant_id
+    )
+    return True
+
+
+def build_document_index() -> Dict:
+    """Index every stored document (documents ingested before the index existed, or after restoring qdrant)"""
+    db = SessionLocal()
+    indexed = skipped = 0
+    try:
+        for doc in DocumentService.iter_documents(db):
+            if index_document(doc):
+                indexed += 1
+            else:
+                skipped += 1
+    finally:
+        db.close()
+    print(f"indexed {indexed} documents, {skipped} without vectors")
+    return {"documents_indexed": indexed, "documents_skipped": skipped}
@@ -0,0 +1,131 @@
+import json
+import os
+from typing import List
+
+import numpy as np
+
+from core.configuration import settings
+
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+ONNX_CONFIG_FILE = "embedding_config.json"
+
+
+class EmbeddingBackend:
+    """
+    Common interface of every encoder.
+    encode() returns a float32 matrix of shape (len(texts), dimension), in input order.
+    """
+
+    name = "base"
+    tokenizer = None
+    max_seq_length: int = 256
+    dimension: int = 0
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchBackend(EmbeddingBackend):
+    """SentenceTransformer running on PyTorch, the reference implementation"""
+
+    name = "torch"
+
+    def __init__(self, model_name: str):
+        from sentence_transformers import SentenceTransformer
+        self.model = SentenceTransformer(model_name)
+        self.tokenizer = self.model.tokenizer
+        self.max_seq_length = self.model.max_seq_length
+        self.dimension = self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=show_progress_bar,
+            convert_to_numpy=True
+        )
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    The same transformer exported by scripts/export_onnx.py, run with ONNX Runtime on CPU.
+    Mean pooling and normalization are done here in numpy, mirroring the SentenceTransformer pipeline.
+    """
+
+    name = "onnx"
+
+    def __init__(self, model_dir: str, quantized: bool = False):
+        try:
+            import onnxruntime as ort
+            from transformers import AutoTokenizer
+        except ImportError as e:
+            raise RuntimeError(f"ONNX backend needs onnxruntime and transformers installed: {e}")
+
+        model_file = os.path.join(model_dir, ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        if not os.path.isfile(model_file):
+            raise RuntimeError(f"{model_file} not found, run: python -m scripts.export_onnx --output {model_dir}")
+
+        with open(os.path.join(model_dir, ONNX_CONFIG_FILE)) as f:
+            config = json.load(f)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if settings.TORCH_NUM_THREADS > 0:
+            options.intra_op_num_threads = settings.TORCH_NUM_THREADS
+
+        self.name = "onnx-int8" if quantized else "onnx"
+        self.session = ort.InferenceSession(model_file, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.max_seq_length = config["max_seq_length"]
+        self.dimension = config["dimension"]
+        self.normalize = config["normalize"]
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation=True,
+            max_length=self.max_seq_length,
+            return_tensors="np"
+        )
+        feeds = {name: encoded[name].astype(np.int64) for name in self.input_names if name in encoded}
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        mask = encoded["attention_mask"][..., None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def encode(self, texts: List[str], batch_size: int = 32, show_progress_bar: bool = False) -> np.ndarray:
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        # longest first so each batch pads to similar lengths
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            index = order[start:start + batch_size]
+            embeddings[index] = self._encode_batch([texts[i] for i in index])
+        return embeddings
+
+
+def create_backend(name: str) -> EmbeddingBackend:
+    """
+    Build the encoder selected by EMBEDDING_BACKEND.
+    :param name: "torch", "onnx" or "onnx-int8"
+    """
+    if name == "torch":
+        return TorchBackend(settings.EMBEDDING_MODEL)
+    elif name == "onnx":
+        return OnnxBackend(settings.EMBEDDING_ONNX_DIR, quantized=False)
+    elif name == "onnx-int8":
+        return OnnxBackend(settings.EMBEDDING_ONNX_DIR, quantized=True)
+    else:
+        raise ValueError(f"Unknown embedding backend: {name}. Use 'torch', 'onnx' or 'onnx-int8'.")
+
+
+def cosine_agreement(reference: np.ndarray, candidate: np.ndarray) -> np.ndarray:
+    """Row-wise cosine similarity between two embedding matrices of the same texts"""
+    reference = reference / np.clip(np.linalg.norm(reference, axis=1, keepdims=True), 1e-12, None)
+    candidate = candidate / np.clip(np.linalg.norm(candidate, axis=1, keepdims=True), 1e-12, None)
+    return (reference * candidate).sum(axis=1)
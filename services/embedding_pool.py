@@ -0,0 +1,166 @@
+import multiprocessing as mp
+import os
+import queue
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from core.configuration import settings
+from core.metrics import registry
+
+POOL_BUSY_SECONDS = registry.counter(
+    "embedding_pool_busy_seconds_total", "Seconds each pool worker spent encoding", labels=("worker",)
+)
+POOL_UTILIZATION = registry.gauge(
+    "embedding_pool_worker_utilization", "Busy fraction of each pool worker since the pool started", labels=("worker",)
+)
+
+# set inside each worker process by _init_worker
+_worker_index: Optional[int] = None
+
+
+def _init_worker(assignments, threads: int):
+    """Runs once per worker process: pin to its cores, size its thread pool and load the encoder"""
+    global _worker_index
+    try:
+        _worker_index, cores = assignments.get(timeout=5)
+    except queue.Empty:
+        # a replacement for a crashed worker: no dedicated cores left to hand out
+        _worker_index, cores = 0, None
+    if cores and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+
+    settings.TORCH_NUM_THREADS = threads
+    from services.embeddings import get_encoder
+    get_encoder()
+
+
+def _segment_dir() -> str:
+    # tmpfs on linux, so the output matrix lives in memory
+    return "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+
+def _encode_shard(task):
+    """Encode one shard of texts straight into the shared output matrix"""
+    from services.embeddings import get_encoder
+
+    path, shape, start, texts = task
+    began = time.perf_counter()
+    embeddings = get_encoder().encode(texts, batch_size=settings.EMBEDDING_BATCH_SIZE)
+    if embeddings.shape[1] != shape[1]:
+        raise ValueError(f"encoder dimension {embeddings.shape[1]} != EMBEDDING_DIMENSION {shape[1]}")
+    output = np.memmap(path, dtype=np.float32, mode="r+", shape=shape)
+    output[start:start + len(texts)] = embeddings
+    del output
+    return _worker_index, time.perf_counter() - began, len(texts)
+
+
+class EmbeddingWorkerPool:
+    """
+    Process pool that shards a large batch of texts across CPU cores.
+    Each worker is pinned to its own subset of cores, holds its own encoder
+    and writes results in place into a shared-memory matrix, so output is never pickled nor copied.
+    """
+
+    def __init__(self, workers: int, threads_per_worker: int = 0):
+        context = mp.get_context("spawn")
+        cpus = sorted(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else list(range(os.cpu_count() or 1))
+        per_worker = max(1, len(cpus) // workers)
+
+        assignments = context.Queue()
+        for i in range(workers):
+            assignments.put((i, cpus[i * per_worker:(i + 1) * per_worker] or None))
+
+        self.workers = workers
+        self._pool = context.Pool(
+            workers,
+            initializer=_init_worker,
+            initargs=(assignments, threads_per_worker or per_worker)
+        )
+        self._started = time.monotonic()
+        self._busy = [0.0] * workers
+        self._shards = [0] * workers
+        self._texts = [0] * workers
+        self._lock = threading.Lock()
+        print(f"started embedding pool: {workers} workers x {threads_per_worker or per_worker} threads")
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Encode texts across the pool; rows come back in input order.
+        The result is a view on the shared segment, not a copy: the segment's name is removed before returning
+        and its memory is released when the returned array is garbage collected.
+        """
+        shape = (len(texts), settings.EMBEDDING_DIMENSION)
+        if not texts:
+            return np.empty(shape, dtype=np.float32)
+        fd, path = tempfile.mkstemp(prefix="embeddings_", suffix=".f32", dir=_segment_dir())
+        os.close(fd)
+        try:
+            output = np.memmap(path, dtype=np.float32, mode="w+", shape=shape)
+            shard_size = settings.EMBEDDING_POOL_SHARD_SIZE
+            tasks = [
+                (path, shape, start, texts[start:start + shard_size])
+                for start in range(0, len(texts), shard_size)
+            ]
+            for worker, busy, count in self._pool.imap_unordered(_encode_shard, tasks):
+                with self._lock:
+                    self._busy[worker] += busy
+                    self._shards[worker] += 1
+                    self._texts[worker] += count
+                POOL_BUSY_SECONDS.inc(busy, worker=worker)
+            # a plain ndarray whose base keeps the mapping alive after the file is unlinked
+            return np.asarray(output)
+        finally:
+            os.unlink(path)
+
+    def stats(self) -> Dict:
+        """Per-worker shard count, texts encoded and busy fraction since the pool started"""
+        elapsed = max(time.monotonic() - self._started, 1e-9)
+        with self._lock:
+            workers = [
+                {
+                    "worker": i,
+                    "shards": self._shards[i],
+                    "texts": self._texts[i],
+                    "busy_seconds": round(self._busy[i], 3),
+                    "utilization": round(self._busy[i] / elapsed, 4)
+                }
+                for i in range(self.workers)
+            ]
+        for worker in workers:
+            POOL_UTILIZATION.set(worker["utilization"], worker=worker["worker"])
+        return {"workers": self.workers, "uptime_seconds": round(elapsed, 1), "per_worker": workers}
+
+    def close(self):
+        self._pool.close()
+        self._pool.join()
+
+
+_pool: Optional[EmbeddingWorkerPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_embedding_pool() -> Optional[EmbeddingWorkerPool]:
+    """The shared pool, started on first use; None when EMBEDDING_POOL_WORKERS is 0"""
+    global _pool
+    if settings.EMBEDDING_POOL_WORKERS <= 0:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = EmbeddingWorkerPool(
+                    settings.EMBEDDING_POOL_WORKERS,
+                    settings.EMBEDDING_POOL_THREADS_PER_WORKER
+                )
+    return _pool
+
+
+def shutdown_embedding_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
@@ -0,0 +1,67 @@
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from core.configuration import settings
+
+
+def _path(document_id: str) -> str:
+    return os.path.join(settings.EMBEDDING_STORE_DIR, f"{document_id}.npz")
+
+
+def load_document_embeddings(document_id: str) -> Dict[str, np.ndarray]:
+    """Persisted float16 vectors of a document keyed by chunk content hash (empty if none were stored)"""
+    if not settings.EMBEDDING_STORE_ENABLED:
+        return {}
+    try:
+        with np.load(_path(document_id)) as data:
+            return dict(zip(data["hashes"].tolist(), data["vectors"]))
+    except FileNotFoundError:
+        return {}
+
+
+def save_document_embeddings(
+    document_id: str, chunks: List[Dict], embeddings: np.ndarray, keep_hashes: Optional[List[str]] = None
+):
+    """
+    Persist the vectors of a document's chunks as one compact float16 file, keyed by content hash.
+    :param chunks: chunks (with content_hash) the embeddings belong to
+    :param keep_hashes: on re-ingestion, every hash of the new version; vectors already stored for them are kept
+                        and vectors of chunks that are gone are dropped
+    """
+    if not settings.EMBEDDING_STORE_ENABLED:
+        return
+
+    vectors = {}
+    if keep_hashes is not None:
+        keep = set(keep_hashes)
+        vectors = {h: v for h, v in load_document_embeddings(document_id).items() if h in keep}
+    for chunk, embedding in zip(chunks, embeddings):
+        vectors[chunk["content_hash"]] = embedding
+
+    if not vectors:
+        # nothing left to keep (e.g. a document stored before this store existed, re-ingested with no new chunks)
+        delete_document_embeddings(document_id)
+        return
+
+    os.makedirs(settings.EMBEDDING_STORE_DIR, exist_ok=True)
+    path = _path(document_id)
+    # write then rename so a reader never sees a half-written file
+    tmp_path = f"{path}.tmp.npz"
+    np.savez(
+        tmp_path,
+        hashes=np.array(list(vectors), dtype="U64"),
+        vectors=np.asarray(list(vectors.values()), dtype=np.float16).reshape(len(vectors), -1)
+    )
+    os.replace(tmp_path, path)
+
+
+def delete_document_embeddings(document_id: str) -> int:
+    """Remove a document's persisted vectors; returns the bytes freed"""
+    try:
+        size = os.path.getsize(_path(document_id))
+        os.remove(_path(document_id))
+        return size
+    except FileNotFoundError:
+        return 0
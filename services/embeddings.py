@@ -1,14 +1,73 @@
-from sentence_transformers import SentenceTransformer
+import threading
+import time
 from typing import List, Dict
+
 import numpy as np
 
-embedding_model = SentenceTransformer("all-MiniLM-l6-v2")
+from core.configuration import settings
+from services.embedding_backends import EmbeddingBackend, create_backend
+
+# the encoder is loaded on first use (or by warm_up) so importing this module stays cheap
+_encoder = None
+_encoder_lock = threading.Lock()
+
+
+def configure_torch_threads():
+    """Apply TORCH_NUM_THREADS to the current process, e.g. once per forked worker"""
+    if settings.TORCH_NUM_THREADS > 0 and settings.EMBEDDING_BACKEND == "torch":
+        import torch
+        torch.set_num_threads(settings.TORCH_NUM_THREADS)
+
+
+def get_encoder() -> EmbeddingBackend:
+    global _encoder
+    if _encoder is None:
+        with _encoder_lock:
+            if _encoder is None:
+                configure_torch_threads()
+                _encoder = create_backend(settings.EMBEDDING_BACKEND)
+                print(f"loaded '{_encoder.name}' embedding backend")
+    return _encoder
+
+
+def get_tokenizer():
+    """Tokenizer of the active embedding model"""
+    return get_encoder().tokenizer
 
-def generate_embeddings(chunks: List[Dict]) -> np.ndarray :
+
+def preload_model():
+    """Load weights without running inference, safe to call in a parent process before forking"""
+    get_encoder()
+
+
+def warm_up() -> float:
+    """Load the model and run one encode so the first request does not pay for it; returns seconds spent"""
+    start = time.perf_counter()
+    get_encoder().encode(["warm up"])
+    return time.perf_counter() - start
+
+
+def encode_texts(texts: List[str], show_progress_bar: bool = False) -> np.ndarray:
+    return get_encoder().encode(
+        texts,
+        batch_size=settings.EMBEDDING_BATCH_SIZE,
+        show_progress_bar=show_progress_bar
+    )
+
+
+def generate_embeddings(chunks: List[Dict], bulk: bool = False) -> np.ndarray :
+    """
+    Embed chunk texts.
+    :param bulk: ingestion-time call; large batches are sharded across the worker pool when it is enabled
+    """
     texts = [chunk['text'] for chunk in chunks]
-    embeddings = embedding_model.encode(texts, show_progress_bar=True)
+    if bulk and len(texts) >= settings.EMBEDDING_POOL_MIN_TEXTS:
+        from services.embedding_pool import get_embedding_pool
+        pool = get_embedding_pool()
+        if pool is not None:
+            return pool.encode(texts)
+    embeddings = encode_texts(texts, show_progress_bar=len(texts) > 1)
     return embeddings
 
 def get_embedding_dim() -> int:
-    return embedding_model.get_sentence_embedding_dimension()
-
+    return settings.EMBEDDING_DIMENSION
@@ -1,33 +1,109 @@
+import threading
+import time
+from typing import Dict, List
+
+from tenacity import Retrying, retry_if_exception, wait_random_exponential, stop_after_attempt
+
+from core.admission import llm_admission, current_deadline, remaining, LLMOverloadedError
 from core.configuration import settings
+from core.metrics import LLM_TOKENS
+
+
+def _is_transient(error: BaseException) -> bool:
+    """Provider errors worth retrying: rate limits, timeouts, connection failures and 5xx"""
+    if isinstance(error, LLMOverloadedError):
+        return False
+    status = getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in (408, 409, 429) or status >= 500
+    return type(error).__name__ in ("APIConnectionError", "APITimeoutError")
+
+
+def _provider_retry_after(error: BaseException) -> float:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return 1.0
 
 class LLMService:
 
     def __init__(self):
-        self.client = None
+        # the client is created on first use so importing this module does not import groq
+        self._client = None
         self.provider = None
+        self._initialized = False
+        self._lock = threading.Lock()
 
-        if settings.GROQ_API_KEY:
-            self._init_groq()
-        else:
-            print("No Groq API key found in settings. LLM will not work.")
+    @property
+    def client(self):
+        if not self._initialized:
+            with self._lock:
+                if not self._initialized:
+                    if settings.GROQ_API_KEY:
+                        self._init_groq()
+                    else:
+                        print("No Groq API key found in settings. LLM will not work.")
+                    self._initialized = True
+        return self._client
 
     def _init_groq(self):
         try:
             from groq import Groq
-            self.client = Groq(api_key=settings.GROQ_API_KEY)
+            # retries are done by generate(), within the request's deadline
+            self._client = Groq(api_key=settings.GROQ_API_KEY, max_retries=0)
             self.provider = "groq"
             print("Using Groq LLM.")
         except Exception as e:
             print(f"Groq initialization failed: {e}")
-            self.client = None
-
-    def generate(self, prompt: str, max_tokens: int = 500, temperature: float = 0.5) -> str:
+            self._client = None
 
+    def _complete(self, messages: List[Dict], max_tokens: int, temperature: float, **options):
+        """
+        One chat completion, admitted through llm_admission and retried with jittered backoff while the deadline allows.
+        :raises LLMOverloadedError: not admitted, or still failing with a transient error at the deadline
+        """
         if not self.client:
             raise RuntimeError("LLM client is not initialized.")
 
-        response = self.client.chat.completions.create(
-            model=settings.LLM_MODEL,
+        deadline = current_deadline()
+        retrying = Retrying(
+            retry=retry_if_exception(_is_transient),
+            wait=wait_random_exponential(multiplier=0.5, max=8),
+            # give up when the next backoff would end past the deadline
+            stop=stop_after_attempt(settings.LLM_MAX_ATTEMPTS)
+                 | (lambda state: time.monotonic() + (state.upcoming_sleep or 0) >= deadline),
+            reraise=True
+        )
+        try:
+            for attempt in retrying:
+                with attempt:
+                    with llm_admission.slot(deadline):
+                        response = self.client.chat.completions.create(
+                            model=settings.LLM_MODEL,
+                            messages=messages,
+                            max_tokens=max_tokens,
+                            temperature=temperature,
+                            timeout=max(1.0, remaining(deadline)),
+                            **options
+                        )
+        except Exception as e:
+            if not _is_transient(e):
+                raise
+            status = getattr(e, "status_code", None)
+            raise LLMOverloadedError(
+                f"LLM provider unavailable: {e}",
+                status_code=429 if status == 429 else 503,
+                retry_after=_provider_retry_after(e)
+            ) from e
+        usage = getattr(response, "usage", None)
+        if usage is not None:
+            LLM_TOKENS.inc(usage.prompt_tokens or 0, kind="prompt")
+            LLM_TOKENS.inc(usage.completion_tokens or 0, kind="completion")
+        return response
+
+    def generate(self, prompt: str, max_tokens: int = 500, temperature: float = 0.5) -> str:
+        response = self._complete(
             messages=[
                 {"role": "system",
                  "content": "You are a helpful AI assistant answering questions based on provided context. Be concise and accurate."},
@@ -38,5 +114,29 @@ class LLMService:
         )
         return response.choices[0].message.content
 
+    def plan(self, messages: List[Dict], tools: List[Dict], max_tokens: int = 300):
+        """
+        One tool-calling completion: the returned message has either tool_calls or a direct answer in content.
+        :param tools: tool specs in the OpenAI function format
+        """
+        response = self._complete(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=0.1,
+            tools=tools,
+            tool_choice="auto"
+        )
+        return response.choices[0].message
+
+    def generate_json(self, messages: List[Dict], max_tokens: int = 300) -> str:
+        """Completion constrained to a JSON object (JSON mode)"""
+        response = self._complete(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=0.1,
+            response_format={"type": "json_object"}
+        )
+        return response.choices[0].message.content
+
 
 llm_service = LLMService()
@@ -1,30 +1,93 @@
-from services.embeddings import generate_embeddings
-from services.vectorsStore import search_similar_chunks
+from services.embeddings import generate_embeddings, encode_texts
+from services.vectorsStore import search_similar_chunks, search_similar_chunks_batch, search_two_stage
 from core.configuration import settings
-from typing import List, Dict, Tuple
+from core.database import SessionLocal
+from services.documentService import DocumentService
+from core.metrics import track_stage
+from typing import List, Dict, Tuple, Optional
 from services.llm_service import llm_service
 class CustomRAG:
 
     @staticmethod
-    def retrieve_context(query: str, top_k: int = 3) -> Tuple[str, List[Dict]]:
+    def retrieve_context(
+        query: str, top_k: int = 3, filters: Optional[Dict] = None, tenant_id: Optional[str] = None
+    ) -> Tuple[str, List[Dict]]:
         query_chunks = [{'text': query}]
-        query_embedding = generate_embeddings(query_chunks)[0]
+        with track_stage("chat", "embed"):
+            query_embedding = generate_embeddings(query_chunks)[0]
 
         # Search in Qdrant
-        results = search_similar_chunks(
-            query_embedding=query_embedding,
-            top_k=top_k,
-            collection_name=settings.QDRANT_COLLECTION
-        )
+        with track_stage("chat", "search"):
+            if settings.RETRIEVAL_TWO_STAGE:
+                results = search_two_stage(
+                    [query_embedding],
+                    top_k=top_k,
+                    collection_name=settings.QDRANT_COLLECTION,
+                    filters=[filters],
+                    tenant_id=tenant_id
+                )[0]
+            else:
+                results = search_similar_chunks(
+                    query_embedding=query_embedding,
+                    top_k=top_k,
+                    collection_name=settings.QDRANT_COLLECTION,
+                    filters=filters,
+                    tenant_id=tenant_id
+                )
+
+        CustomRAG.hydrate_texts(results)
+        return CustomRAG.format_context(results), results
+
+    @staticmethod
+    def retrieve_contexts(
+        queries: List[str], top_k: int = 3, filters: Optional[List[Optional[Dict]]] = None,
+        tenant_id: Optional[str] = None
+    ) -> List[Tuple[str, List[Dict]]]:
+        """retrieve_context for many queries: one encode call and one batched search"""
+        with track_stage("chat_batch", "embed"):
+            query_embeddings = encode_texts(queries)
 
-        if results:
-            context = "\n\n".join([
-                f"[Source {i + 1}] (Relevance: {r['score']:.2f})\n{r['text']}"
-                for i, r in enumerate(results)
-            ])
-        else:
-            context = "No relevant information found in documents."
-        return context, results
+        search = search_two_stage if settings.RETRIEVAL_TWO_STAGE else search_similar_chunks_batch
+        with track_stage("chat_batch", "search"):
+            results = search(
+                query_embeddings,
+                top_k=top_k,
+                collection_name=settings.QDRANT_COLLECTION,
+                filters=filters,
+                tenant_id=tenant_id
+            )
+        CustomRAG.hydrate_texts([hit for query_results in results for hit in query_results])
+        return [(CustomRAG.format_context(query_results), query_results) for query_results in results]
+
+    @staticmethod
+    def hydrate_texts(hits: List[Dict]):
+        """Fill in the text of hits whose payload has none (QDRANT_STORE_TEXT off) from sqlite, in one query"""
+        missing = [hit for hit in hits if hit["text"] is None]
+        if not missing:
+            return
+
+        chunk_ids = [hit["chunk_id"] for hit in missing if hit["chunk_id"]]
+        positions = [(hit["document_id"], hit["chunk_index"]) for hit in missing if not hit["chunk_id"]]
+        db = SessionLocal()
+        try:
+            by_id, by_position = DocumentService.get_chunk_texts(db, chunk_ids, positions)
+        finally:
+            db.close()
+
+        for hit in missing:
+            if hit["chunk_id"]:
+                hit["text"] = by_id.get(hit["chunk_id"], "")
+            else:
+                hit["text"] = by_position.get((hit["document_id"], hit["chunk_index"]), "")
+
+    @staticmethod
+    def format_context(results: List[Dict]) -> str:
+        if not results:
+            return "No relevant information found in documents."
+        return "\n\n".join([
+            f"[Source {i + 1}] (Relevance: {r['score']:.2f})\n{r['text']}"
+            for i, r in enumerate(results)
+        ])
 
     @staticmethod
     def build_prompt(query: str, context: str, chat_history: str = "") -> str:
@@ -60,16 +123,22 @@ class CustomRAG:
             )
 
         prompt = CustomRAG.build_prompt(query, context, chat_history)
-        answer = llm_service.generate(
-            prompt=prompt,
-            max_tokens=500,
-            temperature=0.7
-        )
+        with track_stage("chat", "generate"):
+            answer = llm_service.generate(
+                prompt=prompt,
+                max_tokens=500,
+                temperature=0.7
+            )
         return answer
 
     @staticmethod
-    def answer_query(query: str, chat_history: str = "") -> Tuple[str, List[str]]:
-        context, results = CustomRAG.retrieve_context(query, top_k=3)
+    def answer_query(
+        query: str, chat_history: str = "", filters: Optional[Dict] = None, tenant_id: Optional[str] = None
+    ) -> Tuple[str, List[str]]:
+        context, results = CustomRAG.retrieve_context(query, top_k=3, filters=filters, tenant_id=tenant_id)
         answer = CustomRAG.generate_answer(query, context, chat_history)
-        sources = [r['text'][:150] + "..." for r in results] if results else []
-        return answer, sources
+        return answer, CustomRAG.sources(results)
+
+    @staticmethod
+    def sources(results: List[Dict]) -> List[str]:
+        return [r['text'][:150] + "..." for r in results] if results else []
@@ -0,0 +1,209 @@
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import LargeBinary, and_, cast, func, or_, text, true
+from sqlalchemy.orm import Session
+
+from core.configuration import settings
+from core.database import engine, SessionLocal
+from models.metadata import DocMetaData, ChunkMetadata
+from services.embedding_store import delete_document_embeddings
+from services.vectorsStore import (
+    stored_targets, document_index_name, delete_document_points, delete_document_vector, count_document_points
+)
+
+
+def ttl_days_for(tenant_id: Optional[str], ttl_days: Optional[int] = None) -> int:
+    """Retention of a document: explicit ttl, else the tenant policy, else the global one (0 = forever)"""
+    if ttl_days:
+        return ttl_days
+    return settings.TENANT_TTL_DAYS.get(tenant_id or settings.DEFAULT_TENANT, settings.DOCUMENT_TTL_DAYS)
+
+
+def expiry_for(tenant_id: Optional[str], ttl_days: Optional[int] = None, now: Optional[datetime] = None) -> Optional[datetime]:
+    days = ttl_days_for(tenant_id, ttl_days)
+    return (now or datetime.now()) + timedelta(days=days) if days else None
+
+
+def delete_document(db: Session, document_id: str) -> Optional[Dict]:
+    """
+    Delete a document's Qdrant points (one filtered delete) and its SQL rows (one transaction).
+    The SQL transaction is only committed once the points are gone, so a Qdrant failure leaves the document intact.
+    :return: what was removed, or None if the document does not exist
+    """
+    doc = db.query(DocMetaData).filter(DocMetaData.document_id == document_id).first()
+    if doc is None:
+        return None
+
+    try:
+        # char_count counts characters; the UTF-8 byte length is what the text takes on disk
+        chunk_count, text_bytes = db.query(
+            func.count(ChunkMetadata.id), func.coalesce(func.sum(func.length(cast(ChunkMetadata.text, LargeBinary))), 0)
+        ).filter(ChunkMetadata.document_id == document_id).one()
+        points = count_document_points(document_id, collection_name=settings.QDRANT_COLLECTION, tenant_id=doc.tenant_id)
+
+        db.query(ChunkMetadata).filter(ChunkMetadata.document_id == document_id).delete(synchronize_session=False)
+        db.query(DocMetaData).filter(DocMetaData.document_id == document_id).delete(synchronize_session=False)
+        db.flush()
+
+        delete_document_points(document_id, collection_name=settings.QDRANT_COLLECTION, tenant_id=doc.tenant_id)
+        delete_document_vector(document_id, collection_name=settings.QDRANT_COLLECTION, tenant_id=doc.tenant_id)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    embedding_bytes = delete_document_embeddings(document_id)
+
+    return {
+        "document_id": document_id,
+        "chunks_deleted": chunk_count,
+        "points_deleted": points,
+        "text_bytes_freed": int(text_bytes),
+        # qdrant does not report disk usage over the API; raw float32 vectors are the bulk of it
+        "vector_bytes_freed": points * settings.EMBEDDING_DIMENSION * 4,
+        "embedding_store_bytes_freed": embedding_bytes
+    }
+
+
+def find_expired_documents(db: Session, now: Optional[datetime] = None, limit: int = 100) -> List[str]:
+    """Ids of documents past their explicit expiry or past their tenant's / the global retention"""
+    now = now or datetime.now()
+    conditions = [DocMetaData.expires_at <= now]
+
+    # policies also apply to documents ingested before the policy (no expires_at stamped);
+    # documents without a tenant belong to DEFAULT_TENANT
+    def tenant_in(tenants):
+        match = DocMetaData.tenant_id.in_(tenants)
+        return or_(match, DocMetaData.tenant_id.is_(None)) if settings.DEFAULT_TENANT in tenants else match
+
+    def tenant_not_in(tenants):
+        match = DocMetaData.tenant_id.notin_(tenants)
+        return and_(match, DocMetaData.tenant_id.isnot(None)) if settings.DEFAULT_TENANT in tenants else \
+            or_(match, DocMetaData.tenant_id.is_(None))
+
+    for tenant, days in settings.TENANT_TTL_DAYS.items():
+        if days > 0:
+            conditions.append(and_(
+                DocMetaData.expires_at.is_(None),
+                tenant_in([tenant]),
+                DocMetaData.upload_time <= now - timedelta(days=days)
+            ))
+    if settings.DOCUMENT_TTL_DAYS > 0:
+        overridden = list(settings.TENANT_TTL_DAYS)
+        conditions.append(and_(
+            DocMetaData.expires_at.is_(None),
+            tenant_not_in(overridden) if overridden else true(),
+            DocMetaData.upload_time <= now - timedelta(days=settings.DOCUMENT_TTL_DAYS)
+        ))
+
+    rows = db.query(DocMetaData.document_id).filter(or_(*conditions)).limit(limit).all()
+    return [row.document_id for row in rows]
+
+
+def sweep_expired_documents(batch_size: int = 100) -> Dict:
+    """Delete every expired document, one document per transaction"""
+    db = SessionLocal()
+    deleted, chunks, text_bytes, vector_bytes = 0, 0, 0, 0
+    try:
+        while True:
+            expired = find_expired_documents(db, limit=batch_size)
+            if not expired:
+                break
+            for document_id in expired:
+                result = delete_document(db, document_id)
+                if result:
+                    deleted += 1
+                    chunks += result["chunks_deleted"]
+                    text_bytes += result["text_bytes_freed"]
+                    vector_bytes += result["vector_bytes_freed"]
+            if len(expired) < batch_size:
+                break
+    finally:
+        db.close()
+
+    if deleted:
+        print(f"retention sweep deleted {deleted} documents ({chunks} chunks)")
+    return {
+        "documents_deleted": deleted,
+        "chunks_deleted": chunks,
+        "text_bytes_freed": text_bytes,
+        "vector_bytes_freed": vector_bytes
+    }
+
+
+def _sqlite_path() -> Optional[str]:
+    if engine.url.get_backend_name() != "sqlite":
+        return None
+    database = engine.url.database
+    return database if database and database != ":memory:" else None
+
+
+def _collection_stats(client, collection_name: str) -> Dict:
+    info = client.get_collection(collection_name)
+    return {
+        "points": info.points_count,
+        "indexed_vectors": info.indexed_vectors_count,
+        "segments": info.segments_count,
+        "status": str(info.status)
+    }
+
+
+def compact_storage(wait_seconds: float = 60, deleted_threshold: float = 0.01, vacuum_min_vector_number: int = 100) -> Dict:
+    """
+    VACUUM the SQLite file and make Qdrant vacuum segments holding deleted points, in the chunk collections and
+    document indexes of every endpoint and tenant.
+    Qdrant only vacuums a segment once its share of deleted points passes `deleted_threshold` (default 0.2) and
+    it holds `vacuum_min_vector_number` vectors (default 1000); both are lowered for the duration of the
+    compaction, then each collection's own values are restored.
+    :return: SQLite bytes before/after/reclaimed and Qdrant stats before/after per "<endpoint>/<collection>"
+    """
+    report: Dict = {}
+
+    path = _sqlite_path()
+    if path:
+        before = os.path.getsize(path)
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level="AUTOCOMMIT").execute(text("VACUUM"))
+        after = os.path.getsize(path)
+        report["sqlite"] = {"bytes_before": before, "bytes_after": after, "bytes_reclaimed": before - after}
+
+    from qdrant_client.models import OptimizersConfigDiff
+    targets = stored_targets(settings.QDRANT_COLLECTION) + stored_targets(document_index_name(settings.QDRANT_COLLECTION))
+    stats, previous = {}, {}
+    try:
+        for target in targets:
+            key = f"{target.endpoint}/{target.collection_name}"
+            stats[key] = {"before": _collection_stats(target.client, target.collection_name)}
+            previous[key] = target.client.get_collection(target.collection_name).config.optimizer_config
+            target.client.update_collection(
+                collection_name=target.collection_name,
+                optimizers_config=OptimizersConfigDiff(
+                    deleted_threshold=deleted_threshold, vacuum_min_vector_number=vacuum_min_vector_number
+                )
+            )
+
+        deadline = time.monotonic() + wait_seconds
+        # give the optimizers a moment to pick the new thresholds up before polling the status
+        time.sleep(min(1, wait_seconds) if targets else 0)
+        for target in targets:
+            key = f"{target.endpoint}/{target.collection_name}"
+            after = _collection_stats(target.client, target.collection_name)
+            while "green" not in after["status"].lower() and time.monotonic() < deadline:
+                time.sleep(1)
+                after = _collection_stats(target.client, target.collection_name)
+            stats[key]["after"] = after
+    finally:
+        for target in targets:
+            key = f"{target.endpoint}/{target.collection_name}"
+            if key in previous:
+                target.client.update_collection(
+                    collection_name=target.collection_name,
+                    optimizers_config=OptimizersConfigDiff(
+                        deleted_threshold=previous[key].deleted_threshold,
+                        vacuum_min_vector_number=previous[key].vacuum_min_vector_number
+                    )
+                )
+    report["qdrant"] = stats
+    return report
@@ -0,0 +1,178 @@
+import asyncio
+import hashlib
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Type
+
+from pydantic import BaseModel, ValidationError
+
+from core.admission import LLMOverloadedError
+from core.metrics import track_stage, CACHE_REQUESTS
+from core.profiling import profile_scope
+
+
+class ToolError(Exception):
+    """Raised by a handler to fail with a message meant for the user"""
+
+
+class ToolContext:
+    """
+    Per-turn state handed to every tool handler.
+    Handlers run concurrently in worker threads, so a handler needing the database opens its own session.
+    """
+
+    def __init__(self, chat_history: str = "", filters: Optional[Dict] = None, tenant_id: Optional[str] = None):
+        self.chat_history = chat_history
+        self.filters = filters
+        self.tenant_id = tenant_id
+
+    def cache_key(self) -> str:
+        return json.dumps([self.chat_history, self.filters, self.tenant_id], sort_keys=True, default=str)
+
+
+class ToolResult:
+    def __init__(self, name: str, output: str, ok: bool = True, cached: bool = False):
+        self.name = name
+        self.output = output
+        self.ok = ok
+        self.cached = cached
+
+
+class Tool:
+    """
+    A tool the planning LLM can call.
+    :param args_model: pydantic model of the arguments; its JSON schema is what the model sees
+    :param handler: handler(args, context) -> str, sync (run in a thread) or async
+    :param timeout: seconds before the tool's result is given up on; None for tools with side effects, since a
+                    thread cannot be stopped and would still complete the action after the user was told it failed
+    :param cache_ttl: seconds a result is reused for the same arguments and context, 0 for tools with side effects
+    """
+
+    def __init__(
+        self, name: str, description: str, args_model: Type[BaseModel], handler: Callable,
+        timeout: Optional[float] = 30.0, cache_ttl: float = 0
+    ):
+        self.name = name
+        self.description = description
+        self.args_model = args_model
+        self.handler = handler
+        self.timeout = timeout
+        self.cache_ttl = cache_ttl
+
+    def spec(self) -> Dict:
+        return {
+            "type": "function",
+            "function": {
+                "name": self.name,
+                "description": self.description,
+                "parameters": self.args_model.model_json_schema()
+            }
+        }
+
+
+class _TTLCache:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _run_profiled(tool: Tool, args: BaseModel, context: ToolContext):
+    # profiled in the worker thread doing the work, not on the event loop awaiting it
+    with profile_scope(f"tool_{tool.name}"):
+        return tool.handler(args, context)
+
+
+class ToolRegistry:
+
+    def __init__(self):
+        self._tools: Dict[str, Tool] = {}
+        self._cache = _TTLCache()
+
+    def register(self, tool: Tool) -> Tool:
+        self._tools[tool.name] = tool
+        return tool
+
+    def tool(
+        self, name: str, description: str, args_model: Type[BaseModel], timeout: Optional[float] = 30.0, cache_ttl: float = 0
+    ):
+        """Decorator form of register()"""
+        def decorator(handler: Callable) -> Callable:
+            self.register(Tool(name, description, args_model, handler, timeout, cache_ttl))
+            return handler
+        return decorator
+
+    def get(self, name: str) -> Optional[Tool]:
+        return self._tools.get(name)
+
+    def specs(self) -> List[Dict]:
+        return [tool.spec() for tool in self._tools.values()]
+
+    async def run(self, name: str, arguments: Dict[str, Any], context: ToolContext) -> ToolResult:
+        """Validate arguments and run one tool under its timeout, serving repeated calls from the cache"""
+        tool = self._tools.get(name)
+        if tool is None:
+            return ToolResult(name, f"Unknown tool '{name}'.", ok=False)
+        try:
+            args = tool.args_model.model_validate(arguments or {})
+        except ValidationError as e:
+            return ToolResult(name, f"Invalid arguments for {name}: {e}", ok=False)
+
+        key = None
+        if tool.cache_ttl > 0:
+            key = hashlib.sha256(f"{name}|{args.model_dump_json()}|{context.cache_key()}".encode("utf-8")).hexdigest()
+            cached = self._cache.get(key)
+            CACHE_REQUESTS.inc(cache="tool", result="hit" if cached is not None else "miss")
+            if cached is not None:
+                return ToolResult(name, cached, cached=True)
+
+        with track_stage("tool", f"tool_{name}"):
+            if inspect.iscoroutinefunction(tool.handler):
+                call = tool.handler(args, context)
+            else:
+                call = asyncio.to_thread(_run_profiled, tool, args, context)
+            try:
+                output = await asyncio.wait_for(call, timeout=tool.timeout)
+            except asyncio.TimeoutError:
+                return ToolResult(name, f"{name} did not finish within {tool.timeout:.0f}s.", ok=False)
+            except LLMOverloadedError:
+                raise
+            except ToolError as e:
+                return ToolResult(name, str(e), ok=False)
+            except Exception as e:
+                print(f"tool {name} failed: {e}")
+                return ToolResult(name, f"{name} failed: {e}", ok=False)
+
+        output = output if isinstance(output, str) else str(output)
+        if key is not None:
+            self._cache.set(key, output, tool.cache_ttl)
+        return ToolResult(name, output)
+
+    async def run_all(self, calls: List[Dict], context: ToolContext) -> List[ToolResult]:
+        """Run independent tool calls ({"name", "arguments"}) concurrently; results keep the calls' order"""
+        return list(await asyncio.gather(*(self.run(call["name"], call.get("arguments") or {}, context) for call in calls)))
+
+
+tool_registry = ToolRegistry()
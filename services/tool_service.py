@@ -1,106 +1,209 @@
-from typing import Dict, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
+import asyncio
 import json, re
+from pydantic import BaseModel, Field
 from services.llm_service import llm_service
+from core.admission import LLMOverloadedError
+from core.configuration import settings
+from core.metrics import track_stage
+from core.profiling import profile_scope
 from services.rag_service import CustomRAG
+from services.tool_registry import tool_registry, ToolContext, ToolError
 from sqlalchemy.orm import Session
+from core.database import SessionLocal
 
-class ToolService:
+BOOKING_FIELDS = ["name", "email", "date", "time"]
 
-    @staticmethod
-    def detect_intent(query: str) -> Dict:
-        prompt = f"""
-        Analyze this message and return ONLY JSON:
-        {{
-        "intent": "book_interview" or "ask_question",
-        "name": "full name or null",
-        "email": "email or null",
-        "date": "YYYY-MM-DD or null",
-        "time": "HH:MM or null"
-        }}
-        Message: "{query}"
-        """
-        try:
-            response = llm_service.generate(prompt, max_tokens=200, temperature=0.3)
-            match = re.search(r'\{.*}', response, re.DOTALL)
-            return json.loads(match.group()) if match else {"intent": "ask_question", "name": None, "email": None,
-                                                            "date": None, "time": None}
-        except:
-            return {"intent": "ask_question", "name": None, "email": None, "date": None, "time": None}
+PLANNER_PROMPT = (
+    "You route user messages to tools. Call every tool needed to handle the message; "
+    "independent requests (e.g. two unrelated questions, or a question and a booking) get one call each. "
+    "Questions about the uploaded documents go to answer_from_documents, rephrased to stand on their own. "
+    "Only call book_interview with the details the user actually gave. "
+    "If no tool fits (e.g. a greeting), answer directly and briefly."
+)
 
-    @staticmethod
-    def extract_booking_info(query: str, intent_data: Dict) -> Optional[Dict]:
-        if all(intent_data.get(k) for k in ["name", "email", "date", "time"]):
-            return {k: intent_data[k] for k in ["name", "email", "date", "time"]}
 
-        if intent_data["intent"] == "book_interview":
-            prompt = f"""Extract JSON with name, email, date (YYYY-MM-DD), time (HH:MM) from: "{query}" """
-            try:
-                response = llm_service.generate(prompt, max_tokens=150, temperature=0.1)
-                match = re.search(r'\{.*}', response, re.DOTALL)
-                data = json.loads(match.group()) if match else {}
-                if all(data.get(k) for k in ["name", "email", "date", "time"]):
-                    return data
-            except:
-                return None
-        return None
+class DocumentQuestion(BaseModel):
+    question : str = Field(description="Self-contained question to answer from the uploaded documents")
+
+
+class BookingRequest(BaseModel):
+    name : Optional[str] = Field(default=None, description="Full name")
+    email : Optional[str] = Field(default=None, description="Email address")
+    date : Optional[str] = Field(default=None, description="Interview date, YYYY-MM-DD")
+    time : Optional[str] = Field(default=None, description="Interview time, HH:MM")
+
+
+class ToolService:
 
     @staticmethod
     def create_booking(booking_info: Dict, db: Session) -> Tuple[bool, str]:
-        from models.booking import Booking
         from datetime import datetime
-
-        booking_data = {
-            "name": booking_info["name"],
-            "email": booking_info["email"],
-            "booking_date": booking_info["date"],  # map 'date' -> 'booking_date'
-            "booking_time": booking_info["time"]  # map 'time' -> 'booking_time'
-        }
+        from services.booking import BookingService, SlotUnavailableError
 
         try:
-            datetime.strptime(str(booking_data["booking_date"]), "%Y-%m-%d")
-        except:
+            slot_date = datetime.strptime(str(booking_info["date"]), "%Y-%m-%d").date()
+        except ValueError:
             return False, "Invalid date format. Use YYYY-MM-DD."
 
         try:
-            datetime.strptime(str(booking_data["booking_time"]), "%H:%M")
-        except:
+            slot_time = datetime.strptime(str(booking_info["time"]), "%H:%M").time()
+        except ValueError:
             return False, "Invalid time format. Use HH:MM."
 
         try:
-            booking = Booking(**booking_data)
-            db.add(booking)
-            db.commit()
-            db.refresh(booking)
-            msg = (
-                f"Interview booked!\n"
-                f"Name: {booking.name}\n"
-                f"Email: {booking.email}\n"
-                f"Date: {booking.booking_date}\n"
-                f"Time: {booking.booking_time}\n"
-                f"ID: {booking.id}"
+            booking = BookingService.create_booking(
+                db, name=booking_info["name"], email=booking_info["email"], slot_date=slot_date, slot_time=slot_time
             )
-            return True, msg
+        except SlotUnavailableError as e:
+            free = BookingService.free_slots(db, slot_date, slot_date)
+            alternatives = ", ".join(sorted({slot["slot_time"].strftime("%H:%M") for slot in free})[:3])
+            return False, f"Sorry, {e}." + (f" Free times that day: {alternatives}." if alternatives else " That day is fully booked.")
+        except ValueError as e:
+            return False, f"Cannot book: {e}."
         except Exception as e:
             db.rollback()
             return False, f"Failed to book: {e}"
 
+        msg = (
+            f"Interview booked!\n"
+            f"Name: {booking.name}\n"
+            f"Email: {booking.email}\n"
+            f"Date: {booking.slot_date.isoformat()}\n"
+            f"Time: {booking.slot_time.strftime('%H:%M')}\n"
+            f"ID: {booking.id}"
+        )
+        return True, msg
+
+    @staticmethod
+    def _plan_with_json(messages: List[Dict]) -> Tuple[List[Dict], Optional[str]]:
+        """Planning through JSON mode, for models without native tool calling"""
+        tools = "\n".join(json.dumps(spec["function"]) for spec in tool_registry.specs())
+        response = llm_service.generate_json(messages + [{
+            "role": "user",
+            "content": (
+                f"Available tools:\n{tools}\n"
+                'Return ONLY JSON: {"tool_calls": [{"name": ..., "arguments": {...}}], "answer": null} '
+                'or {"tool_calls": [], "answer": "direct answer"}'
+            )
+        }])
+        match = re.search(r'\{.*}', response or "", re.DOTALL)
+        try:
+            data = json.loads(match.group()) if match else {}
+        except json.JSONDecodeError:
+            data = {}
+        if not isinstance(data, dict):
+            data = {}
+        answer = data.get("answer")
+        return ToolService._normalize_calls(data.get("tool_calls")), answer if isinstance(answer, str) else None
+
+    @staticmethod
+    def _normalize_calls(raw) -> List[Dict]:
+        """Keep the well-formed calls of a JSON-mode reply: a tool name, and arguments as a dict (possibly empty)"""
+        calls = []
+        for call in raw if isinstance(raw, list) else []:
+            if not isinstance(call, dict) or not isinstance(call.get("name"), str) or not call["name"]:
+                continue
+            arguments = call.get("arguments") or {}
+            if isinstance(arguments, str):
+                try:
+                    arguments = json.loads(arguments)
+                except json.JSONDecodeError:
+                    arguments = {}
+            calls.append({"name": call["name"], "arguments": arguments if isinstance(arguments, dict) else {}})
+        return calls
+
+    @staticmethod
+    def plan(query: str, chat_history: str) -> Tuple[List[Dict], Optional[str]]:
+        """
+        One LLM call choosing the tools for a message.
+        :return: tool calls ({"name", "arguments"}) and, when no tool is needed, the direct answer
+        """
+        messages = [{"role": "system", "content": PLANNER_PROMPT}]
+        if chat_history:
+            messages.append({"role": "system", "content": f"Previous conversation:\n{chat_history}"})
+        messages.append({"role": "user", "content": query})
+
+        with track_stage("chat", "plan"):
+            try:
+                message = llm_service.plan(messages, tool_registry.specs())
+            except LLMOverloadedError:
+                raise
+            except Exception as e:
+                # e.g. a model that rejects the tools parameter
+                print(f"tool calling failed, planning in JSON mode: {e}")
+                return ToolService._plan_with_json(messages)
+
+        calls = []
+        for call in message.tool_calls or []:
+            try:
+                arguments = json.loads(call.function.arguments or "{}")
+            except json.JSONDecodeError:
+                arguments = {}
+            calls.append({"name": call.function.name, "arguments": arguments})
+        return calls, message.content
+
     @staticmethod
-    def process_query(query: str, chat_history: str, db: Session) -> Tuple[str, bool]:
-
-        intent_data = ToolService.detect_intent(query)
-
-        if intent_data["intent"] == "book_interview":
-            booking_info = ToolService.extract_booking_info(query, intent_data)
-            if booking_info:
-                success, msg = ToolService.create_booking(booking_info, db)
-                return msg, success  #  msg is string, success is bool
-            else:
-                missing = [k for k in ["name", "email", "date", "time"] if not intent_data.get(k)]
-                msg = "Provide the following info to book interview:\n" + "\n".join(f"• {m}" for m in missing)
-                return msg, False
-        else:
-            answer, _ = CustomRAG.answer_query(query, chat_history)
-            if not isinstance(answer, str):
-                answer = str(answer)
-            return answer, False
+    async def process_query(
+        query: str, chat_history: str, filters: Optional[Dict] = None, tenant_id: Optional[str] = None
+    ) -> Tuple[str, bool]:
+        """
+        Plan the turn in one LLM call, then run the chosen tools concurrently.
+        Planning and sync tools are profiled in their worker threads (profile_scope is per thread).
+        :return: answer, and whether a booking was made
+        """
+        calls, direct_answer = await asyncio.to_thread(ToolService._plan_profiled, query, chat_history)
+        if not calls:
+            if direct_answer:
+                return direct_answer, False
+            # the planner gave nothing usable: fall back to the documents
+            calls = [{"name": "answer_from_documents", "arguments": {"question": query}}]
+
+        context = ToolContext(chat_history=chat_history, filters=filters, tenant_id=tenant_id)
+        results = await tool_registry.run_all(calls, context)
+
+        answer = "\n\n".join(result.output for result in results)
+        is_booking = any(result.name == "book_interview" and result.ok for result in results)
+        return answer, is_booking
+
+    @staticmethod
+    def _plan_profiled(query: str, chat_history: str) -> Tuple[List[Dict], Optional[str]]:
+        with profile_scope("process_query"):
+            return ToolService.plan(query, chat_history)
+
+
+@tool_registry.tool(
+    name="answer_from_documents",
+    description="Answer a question using the uploaded documents (retrieval augmented generation).",
+    args_model=DocumentQuestion,
+    # not cached: a cached answer would keep quoting documents after they are deleted or re-ingested
+    timeout=settings.LLM_REQUEST_DEADLINE_SECONDS
+)
+def answer_from_documents(args: DocumentQuestion, context: ToolContext) -> str:
+    answer, _ = CustomRAG.answer_query(
+        args.question, context.chat_history, filters=context.filters, tenant_id=context.tenant_id
+    )
+    return answer if isinstance(answer, str) else str(answer)
+
 
+@tool_registry.tool(
+    name="book_interview",
+    description="Book an interview. Needs the person's name, email, date (YYYY-MM-DD) and time (HH:MM).",
+    args_model=BookingRequest,
+    # no timeout: an abandoned booking thread would still commit after the user was told it failed
+    timeout=None
+)
+def book_interview(args: BookingRequest, context: ToolContext) -> str:
+    booking_info = args.model_dump()
+    missing = [k for k in BOOKING_FIELDS if not booking_info.get(k)]
+    if missing:
+        raise ToolError("Provide the following info to book interview:\n" + "\n".join(f"• {m}" for m in missing))
+    # one session per invocation: tools of a turn run concurrently in threads and a Session is not thread-safe
+    db = SessionLocal()
+    try:
+        success, msg = ToolService.create_booking(booking_info, db)
+    finally:
+        db.close()
+    if not success:
+        raise ToolError(msg)
+    return msg
@@ -1,72 +1,596 @@
 from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams, PointStruct
-from typing import List, Dict
+from qdrant_client.models import (
+    Distance, VectorParams, PointStruct, Filter, FieldCondition, MatchValue, MatchAny, Range,
+    FilterSelector, SetPayload, SetPayloadOperation, PayloadSchemaType, PayloadSelectorExclude, SearchRequest,
+    KeywordIndexParams, KeywordIndexType, IsEmptyCondition, PayloadField, ShardingMethod, PointIdsList
+)
+from datetime import datetime
+from typing import List, Dict, Optional, NamedTuple
 from core.configuration import settings
+import functools
+import hashlib
+import re
+import threading
 import uuid
 
+import numpy as np
+
+# namespace for deterministic point ids derived from chunk ids
+POINT_ID_NAMESPACE = uuid.UUID("6f1c1f2e-6c4b-4a53-9a55-2d0f6f3b8a10")
+
+
+# payload fields that retrieval can filter on, indexed so filtered search doesn't scan payloads
+PAYLOAD_INDEXES = {
+    "document_id": PayloadSchemaType.KEYWORD,
+    "chunk_id": PayloadSchemaType.KEYWORD,
+    "file_type": PayloadSchemaType.KEYWORD,
+    "strategy": PayloadSchemaType.KEYWORD,
+    "upload_ts": PayloadSchemaType.FLOAT,
+    # is_tenant lets qdrant lay out storage per tenant for the "payload" layout
+    "tenant_id": KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True),
+}
+
+TENANT_LAYOUTS = ("shared", "payload", "collection")
+# per-tenant collections of the "collection" layout are "<collection>__tenant_<tenant>_<hash>", a namespace
+# apart from "<collection>_docs" and the "<collection>_v<timestamp>" rebuilds
+TENANT_COLLECTION_INFIX = "__tenant_"
+
+
+def chunk_point_id(chunk_id: str) -> str:
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, chunk_id))
+
+
+_clients: Dict[str, QdrantClient] = {}
+_clients_lock = threading.Lock()
+# (endpoint, collection) pairs known to exist, so per-tenant collections are not looked up on every call
+_known_collections = set()
+
+
+def _cached_client(key: str, factory) -> QdrantClient:
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = _clients[key] = factory()
+    return client
+
 
 def get_qdrant_client(host: str = None, port: int = None):
     host = host or settings.QDRANT_HOST
     port = port or settings.QDRANT_PORT
-    return QdrantClient(host=host, port=port)
+    # one client (and connection pool) per node instead of one per call
+    return _cached_client(f"{host}:{port}", lambda: QdrantClient(host=host, port=port))
+
+
+def get_endpoint_client(endpoint: str) -> QdrantClient:
+    """Client of a named endpoint from QDRANT_ENDPOINTS; "default" is QDRANT_HOST:QDRANT_PORT"""
+    if endpoint == "default" and endpoint not in settings.QDRANT_ENDPOINTS:
+        return get_qdrant_client()
+    location = settings.QDRANT_ENDPOINTS.get(endpoint)
+    if location is None:
+        raise ValueError(f"unknown qdrant endpoint '{endpoint}', add it to QDRANT_ENDPOINTS")
+    # a url, or ":memory:" for a local in-process instance
+    return _cached_client(f"endpoint:{endpoint}", lambda: QdrantClient(location=location))
+
+
+class VectorTarget(NamedTuple):
+    """Where a tenant's points live"""
+    client: QdrantClient
+    endpoint: str
+    collection_name: str
+    # value of the tenant_id payload filter, None when searches are not restricted to a tenant
+    tenant_filter: Optional[str]
+    shard_key: Optional[str]
+
+
+def _tenant_collection(collection_name: str, tenant: str) -> str:
+    # the readable part is lossy (acme.eu and acme_eu both give acme_eu), the digest keeps names unique per tenant
+    digest = hashlib.sha256(tenant.encode("utf-8")).hexdigest()[:12]
+    readable = re.sub(r'[^A-Za-z0-9_-]', '_', tenant)[:64]
+    return f"{collection_name}{TENANT_COLLECTION_INFIX}{readable}_{digest}"
+
+
+def resolve_target(tenant_id: Optional[str], collection_name: str = "documents") -> VectorTarget:
+    """
+    Route a tenant to its endpoint (QDRANT_TENANT_ROUTES, else "default") and to its place in the layout:
+    - shared: one collection, searches filtered by the tenant_id payload only when a tenant_id is given
+    - payload: one collection per endpoint partitioned by the tenant_id payload, optionally one shard key per tenant
+    - collection: one collection per tenant; the default tenant keeps the base collection.
+      Searches are still filtered by tenant_id, so a misrouted point is never returned to another tenant
+    """
+    tenant = tenant_id or settings.DEFAULT_TENANT
+    endpoint = settings.QDRANT_TENANT_ROUTES.get(tenant, "default")
+    layout = settings.QDRANT_TENANT_LAYOUT
+    if layout not in TENANT_LAYOUTS:
+        raise ValueError(f"QDRANT_TENANT_LAYOUT must be one of {TENANT_LAYOUTS}")
+
+    if layout == "collection" and tenant != settings.DEFAULT_TENANT:
+        collection_name = _tenant_collection(collection_name, tenant)
+    return VectorTarget(
+        client=get_endpoint_client(endpoint),
+        endpoint=endpoint,
+        collection_name=collection_name,
+        tenant_filter=tenant if layout != "shared" or tenant_id else None,
+        shard_key=tenant if layout == "payload" and settings.QDRANT_USE_SHARD_KEYS else None
+    )
+
+
+def _tenant_condition(tenant: str):
+    match = FieldCondition(key="tenant_id", match=MatchValue(value=tenant))
+    if tenant != settings.DEFAULT_TENANT:
+        return match
+    # points stored before tenants existed belong to the default tenant
+    return Filter(should=[match, IsEmptyCondition(is_empty=PayloadField(key="tenant_id"))])
+
 
+def _target_filter(target: VectorTarget, conditions: List) -> Optional[Filter]:
+    """AND the target's tenant partition into a list of conditions"""
+    if target.tenant_filter is not None:
+        conditions = conditions + [_tenant_condition(target.tenant_filter)]
+    return Filter(must=conditions) if conditions else None
 
-def ensure_collection(client: QdrantClient, collection_name: str, vector_size: int = 384):
-    existing = [c.name for c in client.get_collections().collections]
-    if collection_name not in existing:
+
+def _is_not_found(e: Exception) -> bool:
+    # 404 from the server, ValueError("Collection ... not found") from a local instance
+    return getattr(e, "status_code", None) == 404 or (isinstance(e, ValueError) and "not found" in str(e).lower())
+
+
+def _forget_missing_collections(func):
+    """
+    Drop the collection-existence cache when qdrant reports a collection missing (dropped by an operator,
+    a rebuild or compaction) and retry once, so writes recreate it and reads see it gone.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if not _is_not_found(e):
+                raise
+            print(f"qdrant collection missing, refreshing the collection cache: {e}")
+            _known_collections.clear()
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _target_exists(target: VectorTarget) -> bool:
+    key = (target.endpoint, target.collection_name)
+    if key not in _known_collections and collection_or_alias_exists(target.client, target.collection_name):
+        _known_collections.add(key)
+    return key in _known_collections
+
+
+def _ensure_target(target: VectorTarget, vector_size: int):
+    """Create the target collection and the tenant's shard key on first write"""
+    key = (target.endpoint, target.collection_name)
+    if key not in _known_collections:
+        ensure_collection(target.client, target.collection_name, vector_size, custom_sharding=target.shard_key is not None)
+        _known_collections.add(key)
+    if target.shard_key is not None:
+        shard_key = (target.endpoint, target.collection_name, target.shard_key)
+        if shard_key not in _known_collections:
+            try:
+                target.client.create_shard_key(target.collection_name, shard_key=target.shard_key)
+            except Exception as e:
+                # created by another worker, or already there
+                if "already exists" not in str(e):
+                    raise
+            _known_collections.add(shard_key)
+
+
+def collection_or_alias_exists(client: QdrantClient, name: str) -> bool:
+    """True for a collection, or for an alias pointing at one (QDRANT_COLLECTION becomes an alias after a rebuild)"""
+    if name in [c.name for c in client.get_collections().collections]:
+        return True
+    return name in [a.alias_name for a in client.get_aliases().aliases]
+
+
+def ensure_collection(client: QdrantClient, collection_name: str, vector_size: int = 384, custom_sharding: bool = False):
+    if not collection_or_alias_exists(client, collection_name):
         print(f"Creating Qdrant collection '{collection_name}' (size={vector_size})")
         client.create_collection(
             collection_name=collection_name,
-            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
+            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE),
+            sharding_method=ShardingMethod.CUSTOM if custom_sharding else None
         )
+        ensure_payload_indexes(client, collection_name)
     else:
         print(f"Collection '{collection_name}' already exists ")
 
-def init_qdrant_collection(
-    collection_name: str = "documents",
-    vector_size: int = 384,
-    qdrant_host: str = None,
-    qdrant_port: int = None
-):
 
-    client = get_qdrant_client(host=qdrant_host, port=qdrant_port)
-    ensure_collection(client, collection_name, vector_size)
-    return client
+def ensure_payload_indexes(client: QdrantClient, collection_name: str):
+    """Create the payload indexes used by filtered retrieval (no-op for indexes that exist)"""
+    existing = client.get_collection(collection_name).payload_schema or {}
+    for field_name, schema in PAYLOAD_INDEXES.items():
+        if field_name not in existing:
+            client.create_payload_index(collection_name, field_name=field_name, field_schema=schema)
+
+def qdrant_endpoints() -> List[str]:
+    """Every endpoint tenants can be routed to, "default" first"""
+    return ["default"] + [endpoint for endpoint in settings.QDRANT_ENDPOINTS if endpoint != "default"]
+
+
+def stored_targets(collection_name: str = "documents") -> List[VectorTarget]:
+    """
+    Every existing collection holding points of `collection_name`, on every endpoint: the base collection
+    (or its alias) and the per-tenant collections of the "collection" layout. For maintenance across all tenants.
+    """
+    targets = []
+    prefix = f"{collection_name}{TENANT_COLLECTION_INFIX}"
+    for endpoint in qdrant_endpoints():
+        client = get_endpoint_client(endpoint)
+        names = sorted(c.name for c in client.get_collections().collections if c.name.startswith(prefix))
+        if collection_or_alias_exists(client, collection_name):
+            names.insert(0, collection_name)
+        targets.extend(VectorTarget(client, endpoint, name, None, None) for name in names)
+    return targets
+
+
+def init_qdrant_collection(collection_name: str = "documents", vector_size: int = 384) -> QdrantClient:
+    """
+    Create the default tenant's collection on the endpoint its writes go to (QDRANT_ENDPOINTS["default"] when set),
+    and add missing payload indexes to every existing collection on every endpoint
+    """
+    target = resolve_target(None, collection_name)
+    _ensure_target(target, vector_size)
+    for stored in stored_targets(collection_name):
+        ensure_payload_indexes(stored.client, stored.collection_name)
+    return target.client
+
+
+def build_search_filter(filters: Optional[Dict], target: Optional[VectorTarget] = None) -> Optional[Filter]:
+    """
+    Translate retrieval filters into a Qdrant payload filter.
+    :param filters: dict with optional document_ids, file_type, chunking_strategy,
+                    uploaded_after and uploaded_before (datetimes)
+    :param target: adds the tenant partition of the "payload" layout
+    """
+    conditions = []
+    filters = filters or {}
+    if filters.get("document_ids"):
+        conditions.append(FieldCondition(key="document_id", match=MatchAny(any=list(filters["document_ids"]))))
+    if filters.get("file_type"):
+        conditions.append(FieldCondition(key="file_type", match=MatchValue(value=filters["file_type"].lower().lstrip("."))))
+    if filters.get("chunking_strategy"):
+        conditions.append(FieldCondition(key="strategy", match=MatchValue(value=filters["chunking_strategy"])))
+    if filters.get("uploaded_after") or filters.get("uploaded_before"):
+        conditions.append(FieldCondition(key="upload_ts", range=Range(
+            gte=filters["uploaded_after"].timestamp() if filters.get("uploaded_after") else None,
+            lte=filters["uploaded_before"].timestamp() if filters.get("uploaded_before") else None
+        )))
+    if target is not None:
+        return _target_filter(target, conditions)
+    return Filter(must=conditions) if conditions else None
+
+
+def chunk_payload(
+    chunk: Dict, doc_id: str, file_type: Optional[str], upload_ts: float, tenant_id: Optional[str] = None
+) -> Dict:
+    payload = {
+        "document_id": doc_id,
+        "chunk_id": chunk.get('chunk_id'),
+        "chunk_index": chunk['chunk_index'],
+        "strategy": chunk['strategy'],
+        "char_count": chunk['char_count'],
+        "file_type": file_type.lower() if file_type else None,
+        "upload_ts": upload_ts,
+        # stored in every layout, so a deployment can move to the "payload" layout without re-uploading
+        "tenant_id": tenant_id or settings.DEFAULT_TENANT
+    }
+    if settings.QDRANT_STORE_TEXT:
+        payload["text"] = chunk['text']
+    return payload
+
 
+def _document_filter(doc_id: str, *conditions) -> Filter:
+    return Filter(must=[FieldCondition(key="document_id", match=MatchValue(value=doc_id)), *conditions])
 
-def store_embeddings(chunks: List[Dict], embeddings: List, doc_id: str, collection_name: str = "documents"):
-    client = get_qdrant_client()
-    ensure_collection(client, collection_name, vector_size=len(embeddings[0]))
+
+@_forget_missing_collections
+def store_embeddings(
+    chunks: List[Dict], embeddings: List, doc_id: str, collection_name: str = "documents",
+    file_type: Optional[str] = None, upload_time: Optional[datetime] = None, tenant_id: Optional[str] = None
+):
+    """Upsert chunk points; point ids derive from the chunk ids (DocumentService.assign_chunk_ids), never random"""
+    if any('chunk_id' not in chunk for chunk in chunks):
+        raise ValueError("chunk ids must be assigned before storing embeddings")
+    target = resolve_target(tenant_id, collection_name)
+    upload_ts = (upload_time or datetime.now()).timestamp()
+    _ensure_target(target, vector_size=len(embeddings[0]))
 
     points = [
         PointStruct(
-            id=str(uuid.uuid4()),
+            id=chunk_point_id(chunk['chunk_id']),
             vector=embedding,
+            payload=chunk_payload(chunk, doc_id, file_type, upload_ts, tenant_id)
+        )
+        for chunk, embedding in zip(chunks, embeddings)
+    ]
+    target.client.upsert(collection_name=target.collection_name, points=points, shard_key_selector=target.shard_key)
+    print(f"Stored {len(points)} embeddings in '{target.collection_name}' ({target.endpoint})")
+
+
+@_forget_missing_collections
+def update_chunk_positions(moved_chunks: List[Dict], collection_name: str = "documents", tenant_id: Optional[str] = None):
+    """Rewrite chunk_index of kept chunks in one batched request, without touching their vectors"""
+    if not moved_chunks:
+        return
+    target = resolve_target(tenant_id, collection_name)
+    target.client.batch_update_points(
+        collection_name=target.collection_name,
+        update_operations=[
+            SetPayloadOperation(set_payload=SetPayload(
+                payload={"chunk_index": chunk['chunk_index']},
+                points=[chunk_point_id(chunk['chunk_id'])],
+                shard_key=target.shard_key
+            ))
+            for chunk in moved_chunks
+        ]
+    )
+
+
+@_forget_missing_collections
+def delete_chunk_points(
+    doc_id: str, chunk_ids: List[str], collection_name: str = "documents", tenant_id: Optional[str] = None
+):
+    """Delete the points of the given chunks of one document with a single filtered delete"""
+    if not chunk_ids:
+        return
+    target = resolve_target(tenant_id, collection_name)
+    target.client.delete(
+        collection_name=target.collection_name,
+        points_selector=FilterSelector(filter=_document_filter(
+            doc_id, FieldCondition(key="chunk_id", match=MatchAny(any=chunk_ids))
+        )),
+        shard_key_selector=target.shard_key
+    )
+    print(f"Deleted points of {len(chunk_ids)} chunks of document {doc_id}")
+
+
+@_forget_missing_collections
+def count_document_points(doc_id: str, collection_name: str = "documents", tenant_id: Optional[str] = None) -> int:
+    target = resolve_target(tenant_id, collection_name)
+    if not _target_exists(target):
+        return 0
+    return target.client.count(
+        collection_name=target.collection_name,
+        count_filter=_document_filter(doc_id),
+        exact=True,
+        shard_key_selector=target.shard_key
+    ).count
+
+
+@_forget_missing_collections
+def delete_document_points(doc_id: str, collection_name: str = "documents", tenant_id: Optional[str] = None):
+    """Delete every point of a document"""
+    target = resolve_target(tenant_id, collection_name)
+    if not _target_exists(target):
+        return
+    target.client.delete(
+        collection_name=target.collection_name,
+        points_selector=FilterSelector(filter=_document_filter(doc_id)),
+        shard_key_selector=target.shard_key
+    )
+    print(f"Deleted all points of document {doc_id}")
+
+
+@_forget_missing_collections
+def update_document_payload(
+    doc_id: str, payload: Dict, collection_name: str = "documents", tenant_id: Optional[str] = None
+):
+    """Set payload fields on every point of a document in one request"""
+    target = resolve_target(tenant_id, collection_name)
+    target.client.set_payload(
+        collection_name=target.collection_name,
+        payload=payload,
+        points=_document_filter(doc_id),
+        shard_key_selector=target.shard_key
+    )
+
+
+@_forget_missing_collections
+def search_similar_chunks(
+    query_embedding, top_k: int = 5, collection_name: str = "documents", filters: Optional[Dict] = None,
+    tenant_id: Optional[str] = None
+) -> List[Dict]:
+    """
+    Nearest chunks to the query embedding, among the tenant's chunks only.
+    Hits carry no text when QDRANT_STORE_TEXT is off; the caller hydrates them (CustomRAG.hydrate_texts).
+    :param filters: optional retrieval filters, see build_search_filter
+    """
+    target = resolve_target(tenant_id, collection_name)
+    if not _target_exists(target):
+        return []
+    results = target.client.search(
+        collection_name=target.collection_name,
+        query_vector=query_embedding.tolist(),
+        query_filter=build_search_filter(filters, target),
+        limit=top_k,
+        with_payload=_search_payload(),
+        shard_key_selector=target.shard_key
+    )
+
+    return [_hit(r) for r in results]
+
+
+@_forget_missing_collections
+def search_similar_chunks_batch(
+    query_embeddings, top_k: int = 5, collection_name: str = "documents", filters: Optional[List[Optional[Dict]]] = None,
+    tenant_id: Optional[str] = None
+) -> List[List[Dict]]:
+    """
+    Nearest chunks for many queries of one tenant in one round trip (texts as in search_similar_chunks).
+    :param filters: optional retrieval filters per query
+    """
+    filters = filters or [None] * len(query_embeddings)
+    target = resolve_target(tenant_id, collection_name)
+    if not _target_exists(target):
+        return [[] for _ in query_embeddings]
+    results = target.client.search_batch(
+        collection_name=target.collection_name,
+        requests=[
+            SearchRequest(
+                vector=np.asarray(embedding).tolist(),
+                filter=build_search_filter(query_filters, target),
+                limit=top_k,
+                with_payload=_search_payload(),
+                shard_key=target.shard_key
+            )
+            for embedding, query_filters in zip(query_embeddings, filters)
+        ]
+    )
+
+    return [[_hit(r) for r in query_results] for query_results in results]
+
+
+def document_index_name(collection_name: str = "documents") -> str:
+    """Collection with one centroid vector per document, searched before the chunks in two-stage retrieval"""
+    return f"{collection_name}_docs"
+
+
+def document_point_id(doc_id: str) -> str:
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"document:{doc_id}"))
+
+
+@_forget_missing_collections
+def store_document_vector(
+    doc_id: str, embeddings, collection_name: str = "documents", file_type: Optional[str] = None,
+    strategy: Optional[str] = None, upload_time: Optional[datetime] = None, tenant_id: Optional[str] = None
+):
+    """Upsert a document's centroid (mean of its chunk embeddings) into the document index"""
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if not len(vectors):
+        return
+    centroid = vectors.mean(axis=0)
+    target = resolve_target(tenant_id, document_index_name(collection_name))
+    _ensure_target(target, vector_size=len(centroid))
+    target.client.upsert(
+        collection_name=target.collection_name,
+        points=[PointStruct(
+            id=document_point_id(doc_id),
+            vector=centroid.tolist(),
+            # the chunk payload's filter fields, so retrieval filters apply to both stages
             payload={
                 "document_id": doc_id,
-                "chunk_index": chunk['chunk_index'],
-                "text": chunk['text'],
-                "strategy": chunk['strategy'],
-                "char_count": chunk['char_count']
+                "file_type": file_type.lower() if file_type else None,
+                "strategy": strategy,
+                "upload_ts": (upload_time or datetime.now()).timestamp(),
+                "tenant_id": tenant_id or settings.DEFAULT_TENANT,
+                "chunk_count": len(vectors)
             }
+        )],
+        shard_key_selector=target.shard_key
+    )
+
+
+@_forget_missing_collections
+def delete_document_vector(doc_id: str, collection_name: str = "documents", tenant_id: Optional[str] = None):
+    target = resolve_target(tenant_id, document_index_name(collection_name))
+    if not _target_exists(target):
+        return
+    target.client.delete(
+        collection_name=target.collection_name,
+        points_selector=PointIdsList(points=[document_point_id(doc_id)]),
+        shard_key_selector=target.shard_key
+    )
+
+
+@_forget_missing_collections
+def document_chunk_vectors(doc_id: str, collection_name: str = "documents", tenant_id: Optional[str] = None) -> np.ndarray:
+    """Vectors of every chunk point of a document, read back from qdrant"""
+    target = resolve_target(tenant_id, collection_name)
+    if not _target_exists(target):
+        return np.empty((0, settings.EMBEDDING_DIMENSION), dtype=np.float32)
+    vectors, offset = [], None
+    while True:
+        points, offset = target.client.scroll(
+            collection_name=target.collection_name,
+            scroll_filter=_document_filter(doc_id),
+            limit=1000,
+            offset=offset,
+            with_payload=False,
+            with_vectors=True,
+            shard_key_selector=target.shard_key
         )
-        for chunk, embedding in zip(chunks, embeddings)
-    ]
-    client.upsert(collection_name=collection_name, points=points)
-    print(f"Stored {len(points)} embeddings in '{collection_name}'")
-
-
-def search_similar_chunks(query_embedding, top_k: int = 5, collection_name: str = "documents") -> List[Dict]:
-    client = get_qdrant_client()
-    results = client.search(collection_name=collection_name, query_vector=query_embedding.tolist(), limit=top_k)
-
-    return [
-        {
-            "id": r.id,
-            "score": r.score,
-            "text": r.payload["text"],
-            "document_id": r.payload["document_id"],
-            "chunk_index": r.payload["chunk_index"]
-        }
-        for r in results
+        vectors.extend(point.vector for point in points)
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32).reshape(len(vectors), -1)
+
+
+@_forget_missing_collections
+def search_documents(
+    query_embeddings, top_n: int = 20, collection_name: str = "documents", filters: Optional[List[Optional[Dict]]] = None,
+    tenant_id: Optional[str] = None
+) -> List[List[str]]:
+    """Ids of the top_n documents (by centroid similarity) for each query, in one round trip"""
+    filters = filters or [None] * len(query_embeddings)
+    target = resolve_target(tenant_id, document_index_name(collection_name))
+    if not _target_exists(target):
+        return [[] for _ in query_embeddings]
+    results = target.client.search_batch(
+        collection_name=target.collection_name,
+        requests=[
+            SearchRequest(
+                vector=np.asarray(embedding).tolist(),
+                filter=build_search_filter(query_filters, target),
+                limit=top_n,
+                with_payload=["document_id"],
+                shard_key=target.shard_key
+            )
+            for embedding, query_filters in zip(query_embeddings, filters)
+        ]
+    )
+    return [[r.payload["document_id"] for r in query_results] for query_results in results]
+
+
+def search_two_stage(
+    query_embeddings, top_k: int = 5, collection_name: str = "documents", filters: Optional[List[Optional[Dict]]] = None,
+    tenant_id: Optional[str] = None, top_documents: Optional[int] = None
+) -> List[List[Dict]]:
+    """
+    Hierarchical retrieval: select each query's top documents from the document index, then search only their chunks.
+    Two round trips whatever the number of queries; a query whose first stage finds no document
+    (e.g. an index not built yet) falls back to a flat chunk search.
+    :param top_documents: first-stage depth, RETRIEVAL_TOP_DOCUMENTS if None
+    """
+    filters = filters or [None] * len(query_embeddings)
+    document_ids = search_documents(
+        query_embeddings, top_documents or settings.RETRIEVAL_TOP_DOCUMENTS, collection_name, filters, tenant_id
+    )
+    chunk_filters = [
+        {**(query_filters or {}), "document_ids": ids} if ids else query_filters
+        for query_filters, ids in zip(filters, document_ids)
     ]
+    return search_similar_chunks_batch(query_embeddings, top_k, collection_name, chunk_filters, tenant_id)
+
+
+def _search_payload():
+    # without stored text, only the small filter fields travel over the wire
+    return True if settings.QDRANT_STORE_TEXT else PayloadSelectorExclude(exclude=["text"])
+
+
+def _hit(r) -> Dict:
+    return {
+        "id": r.id,
+        "score": r.score,
+        "text": r.payload.get("text"),
+        "chunk_id": r.payload.get("chunk_id"),
+        "document_id": r.payload["document_id"],
+        "chunk_index": r.payload["chunk_index"]
+    }
+
+
+def drop_payload_text(collection_name: str = "documents"):
+    """
+    Remove chunk text from every point's payload (sqlite keeps its copy), e.g. after turning QDRANT_STORE_TEXT off.
+    Covers every endpoint and every per-tenant collection.
+    """
+    for target in stored_targets(collection_name):
+        target.client.delete_payload(
+            collection_name=target.collection_name,
+            keys=["text"],
+            points=FilterSelector(filter=Filter())
+        )
+        print(f"Dropped chunk text from payloads in '{target.collection_name}' ({target.endpoint})")
@@ -1,6 +1,7 @@
 import numpy as np
 from services.embeddings import generate_embeddings
 from services.vectorsStore import search_similar_chunks
+from services.rag_service import CustomRAG
 
 # Example query
 query = "explain about the mission vission and what codeforchange is doing with codefest"
@@ -10,6 +11,7 @@ query_embedding = generate_embeddings([{"text": query}])[0]
 
 # Search top 5 similar chunks
 results = search_similar_chunks(query_embedding, top_k=5)
+CustomRAG.hydrate_texts(results)
 
 # Print results
 for r in results: